@@ -1,6 +1,10 @@
 # Represents a node containing some commands to execute.
 
 from copy import deepcopy
+import logging
+import logs
+
+log = logs.get('ast')
 
 class AST:
     def __init__(self, type, meta = None, children = []):
@@ -24,14 +28,22 @@ class AST:
     def __cmp__(self, o): 
         return cmp(self.type, o)
 
-def printAST(ast, level=0):
-    if level > 10: return
+def printAST(ast):
+    """ log ast at debug level; nothing is formatted unless that is
+        enabled """
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('\n'.join(formatAST(ast)))
+
+def formatAST(ast, level=0):
+    """ the lines of an indented dump of ast, ten levels deep """
+    if level > 10: return []
 
-    print '    ' * level,
+    indent = '    ' * level
     if ast and len(ast) > 0:
-        print ast, '{'
+        lines = ['%s %s {' % (indent, ast)]
         for child in ast:
-            printAST(child, level + 1)
-        print '    ' * level, '}'
+            lines += formatAST(child, level + 1)
+        lines.append('%s }' % indent)
+        return lines
     else:
-        print ast
+        return ['%s %s' % (indent, ast)]
@@ -1,12 +1,106 @@
 # Low-level execution of AST commands using xdotool.
 
-import os, string
+import os, string, threading, time
 import scan
+import logs
+
+log = logs.get('automator')
+
+class CommandBatch:
+    """ runs command lines a little later than they are executed, so
+        that the keystrokes of utterances that come in quick succession
+        are sent by one process. Commands are run once no new command has
+        come for window seconds, but at most max_delay seconds after the
+        first of them. Consecutive commands of the same program are
+        merged into one. Only the worker thread runs commands, so they
+        run in order. """
+
+    def __init__(self, window, max_delay, run=os.system):
+        self.window = window
+        self.max_delay = max_delay
+        self.run = run
+        self.pending = []
+        self.first = None
+        self.last = None
+        self.runs = 0
+        self.merged = 0
+        # the worker is running commands it has taken from pending
+        self.running = False
+        self.flushing = False
+        self.condition = threading.Condition()
+        thread = threading.Thread(target=self.run_pending)
+        thread.daemon = True
+        thread.start()
+
+    def add(self, command, program=None):
+        if not program or not command.startswith(program + ' '):
+            program = None
+        with self.condition:
+            if program and self.pending and self.pending[-1][0] == program:
+                self.pending[-1][1] += command[len(program):]
+                self.merged += 1
+            else:
+                self.pending.append([program, command])
+            self.last = time.time()
+            if self.first is None:
+                self.first = self.last
+            self.condition.notify_all()
+
+    def run_pending(self):
+        while True:
+            with self.condition:
+                while len(self.pending) == 0:
+                    self.condition.wait()
+                while not self.flushing:
+                    delay = min(self.last + self.window,
+                        self.first + self.max_delay) - time.time()
+                    if delay <= 0: break
+                    self.condition.wait(delay)
+                commands = self.take()
+                self.running = True
+            try:
+                self.run_all(commands)
+            finally:
+                with self.condition:
+                    self.running = False
+                    self.condition.notify_all()
+
+    def take(self):
+        commands = [c[1] for c in self.pending]
+        self.pending = []
+        self.first = self.last = None
+        return commands
+
+    def run_all(self, commands):
+        for command in commands:
+            self.runs += 1
+            self.run(command)
+
+    def flush(self):
+        """ run all pending commands now, and return once they and any
+            the worker was already running have finished """
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            while self.pending or self.running:
+                self.condition.wait()
+            self.flushing = False
+
+    def __str__(self):
+        return 'batch: %d processes, %d commands merged' % (self.runs,
+            self.merged)
 
 class Automator:
+    # the command that flush() runs, which the keystrokes are appended to
+    program = None
+    # a CommandBatch that runs the commands, instead of running each
+    # when it is executed
+    batch = None
+
     def __init__(self, real = True):
         self.char_list = []
         self.real = real
+        self.executed = []
 
     def add_keystrokes(self, keystrokes):
         self.char_list.append(keystrokes)
@@ -14,9 +108,13 @@ class Automator:
     def execute(self, command):
         if command == '': return
 
-        print "`%s`" % command
+        log.info('`%s`', command)
+        self.executed.append(command)
         if self.real:
-            os.system(command)
+            if self.batch is not None:
+                self.batch.add(command, self.program)
+            else:
+                os.system(command)
 
     def key(self, k):
         """ add keystrokes to the list. The first character will be capitalized. """
@@ -50,11 +148,12 @@ class Automator:
     
 
 class XDoAutomator(Automator):
+    program = '/usr/bin/xdotool'
 
     def flush(self):
         if len(self.char_list) == 0: return
 
-        command = '/usr/bin/xdotool' + ' '
+        command = self.program + ' '
         command += ' '.join(self.char_list)
         self.execute(command)
         self.char_list = []
@@ -83,6 +182,7 @@ class XDoAutomator(Automator):
 
 
 class CLIClickAutomator(Automator):
+    program = 'cliclick'
 
     keymap = {
         "apostrophe": 't:"\'"',
@@ -119,7 +219,7 @@ class CLIClickAutomator(Automator):
     def flush(self):
         if len(self.char_list) == 0: return
 
-        command = 'cliclick' + ' '
+        command = self.program + ' '
         command += ' '.join(self.char_list)
         self.execute(command)
         self.char_list = []
@@ -160,6 +260,7 @@ class CLIClickAutomator(Automator):
 
 
 class NirCmdAutomator(Automator):
+    program = 'C:\\Tools\\nircmd-x64\\nircmd.exe sendkeypress'
 
     # nircmd.exe transformations used here are keyboard layout specific;
     # they rely on virtual key codes
@@ -233,7 +334,7 @@ class NirCmdAutomator(Automator):
     def flush(self):
         if len(self.char_list) == 0: return
 
-        command = 'C:\\Tools\\nircmd-x64\\nircmd.exe sendkeypress' + ' '
+        command = self.program + ' '
         command += ' '.join(self.char_list)
         self.execute(command)
         self.char_list = []
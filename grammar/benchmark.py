@@ -0,0 +1,145 @@
+# Times the scanner, parser and executor on the test cases and on
+# synthetic stress inputs, to catch performance regressions in spark.py
+# and parse.py.
+#
+# python benchmark.py [--json out.json] [--compare old.json]
+#     [--profile stats.json] [testcases]
+
+import json, os, platform, sys, time
+from scan import find_keywords, scan
+from parse import SingleInputParser, GrammaticalError, parse
+from execute import ExecuteCommands
+
+stress = [
+    ('long phrase', 'phrase ' + ' '.join(['it is dark outside'] * 15)),
+    ('deep chain', ' '.join(['up', 'down', 'left', 'right'] * 20)),
+    ('large number', 'number nine hundred ninety nine billion nine hundred '
+        'ninety nine million nine hundred ninety nine thousand nine '
+        'hundred ninety nine'),
+    ('many modifiers', 'control alt ' * 8 + 'zulu'),
+    ('letters', ' '.join(['arch bravo charlie delta echo fox golf'] * 5)),
+]
+
+def earley_stats(parser):
+    """ size of the Earley sets built by the last parse """
+    sizes = [len(s) for s in parser.sets]
+    return {'items': sum(sizes), 'max_set': max(sizes),
+        'links': len(parser.links)}
+
+def best_time(f, repeat):
+    """ fastest of repeat calls to f, and f's last result """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = f()
+        elapsed = time.time() - start
+        if best is None or elapsed < best: best = elapsed
+    return best, result
+
+def run(parser, name, line, repeat):
+    result = {'name': name, 'text': line}
+    result['scan'], tokens = best_time(lambda: scan(line, False), repeat)
+    result['tokens'] = len(tokens)
+    try:
+        # the parser modifies some tokens, so every parse gets new ones
+        lists = [scan(line, False) for i in range(repeat)]
+        result['parse'], ast = best_time(lambda: parse(parser, lists.pop()),
+            repeat)
+    except GrammaticalError as e:
+        result['error'] = str(e)
+        return result
+    result.update(earley_stats(parser))
+    result['execute'], _ = best_time(lambda: ExecuteCommands(ast, False),
+        repeat)
+    return result
+
+def compare(old, new, tolerance):
+    """ lines describing every input that got slower than tolerance
+        times its old time """
+    old = dict([(r['name'], r) for r in old['inputs']])
+    slower = []
+    for r in new['inputs']:
+        if r['name'] not in old: continue
+        for stage in ('scan', 'parse', 'execute'):
+            if stage not in r or stage not in old[r['name']]: continue
+            before, after = old[r['name']][stage], r[stage]
+            # timer resolution makes tiny times meaningless
+            if after > before * tolerance and after - before > 50e-6:
+                slower.append('%s: %s %.1f us -> %.1f us' % (r['name'],
+                    stage, before * 1e6, after * 1e6))
+    return slower
+
+if __name__ == '__main__':
+    import argparse
+    here = os.path.dirname(os.path.abspath(__file__))
+    arg_parser = argparse.ArgumentParser(
+        description='Benchmark the scanner, parser and executor')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=20,
+        help='Time each input this many times and keep the fastest')
+    arg_parser.add_argument('--json', help='Write the results to this file')
+    arg_parser.add_argument('--compare',
+        help='Fail if an input is slower than in this earlier --json file')
+    arg_parser.add_argument('--tolerance', type=float, default=2.0,
+        help='How many times slower counts as a regression (default: 2)')
+    arg_parser.add_argument('--profile',
+        help='Parse every input once more with GenericParser profiling '
+             'enabled, and write the statistics to this file as JSON')
+    arg_parser.add_argument('testcases', nargs='?',
+        default=os.path.join(here, '..', 'tests', 'testcases.txt'))
+    args = arg_parser.parse_args()
+
+    parser = SingleInputParser()
+    find_keywords(parser)
+
+    inputs = []
+    for line in open(args.testcases):
+        if line.strip() == '': continue
+        inputs.append((line.strip(), line.strip()))
+    inputs += stress
+
+    results = {'python': platform.python_version(), 'repeat': args.repeat,
+        'inputs': [run(parser, name, line, args.repeat)
+            for name, line in inputs]}
+    for stage in ('scan', 'parse', 'execute'):
+        results[stage] = sum([r.get(stage, 0) for r in results['inputs']])
+
+    print '%-40s %6s %9s %9s %9s %6s %6s' % ('input', 'tokens', 'scan us',
+        'parse us', 'exec us', 'items', 'links')
+    for r in results['inputs']:
+        if 'error' in r:
+            print '%-40s %s' % (r['name'][:40], r['error'])
+            continue
+        print '%-40s %6d %9.1f %9.1f %9.1f %6d %6d' % (r['name'][:40],
+            r['tokens'], r['scan'] * 1e6, r['parse'] * 1e6,
+            r['execute'] * 1e6, r['items'], r['links'])
+    print 'total: scan %.2f ms, parse %.2f ms, execute %.2f ms' % (
+        results['scan'] * 1e3, results['parse'] * 1e3,
+        results['execute'] * 1e3)
+
+    if args.profile:
+        # separately, since profiling slows the parser down
+        parser.enableProfile()
+        for name, line in inputs:
+            try:
+                parse(parser, scan(line, False))
+            except GrammaticalError:
+                pass
+        stats = parser.profileStats()
+        parser.disableProfile()
+        with open(args.profile, 'w') as f:
+            json.dump(stats, f, indent=1, sort_keys=True)
+        print 'rules that did the most work:'
+        for r in stats['rules'][:10]:
+            print '    %-24s predicted %6d completed %6d' % (r['name'],
+                r['predicted'], r['completed'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        slower = compare(json.load(open(args.compare)), results,
+            args.tolerance)
+        for line in slower:
+            print 'slower:', line
+        if slower:
+            sys.exit(1)
@@ -0,0 +1,45 @@
+# Cache of the automator commands produced for recent utterances.
+
+from collections import OrderedDict
+
+class CommandCache:
+    """ least-recently-used map from an utterance's words (plus anything
+        else that affects how it is parsed) to the command lines that
+        executing it produced """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, line):
+        # same normalization as scan()
+        return tuple(line.lower().split())
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        commands = self.entries.pop(key)
+        self.entries[key] = commands
+        return commands
+
+    def put(self, key, commands):
+        if self.size <= 0: return
+        self.entries[key] = commands
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0: return 0.0
+        return float(self.hits) / total
+
+    def __str__(self):
+        return 'cache: %d hits, %d misses (%.1f%%), %d entries' % (
+            self.hits, self.misses, 100 * self.hit_rate(), len(self.entries))
@@ -0,0 +1,124 @@
+# Finds grammar keywords that the recognizer may confuse, and the words
+# that most often make commands fail.
+
+import re
+from lm import get_terminals
+from scan import find_keywords, scan
+from parse import parse, GrammaticalError
+
+def edit_distance(a, b):
+    """ Levenshtein distance between two sequences (words, phone lists) """
+    previous = range(len(b) + 1)
+    for i in range(len(a)):
+        current = [i + 1]
+        for j in range(len(b)):
+            current.append(min(previous[j+1] + 1, current[j] + 1,
+                previous[j] + (a[i] != b[j])))
+        previous = current
+    return previous[-1]
+
+def read_lexicon(f):
+    """ read a pronunciation lexicon in CMUdict or Kaldi lexicon.txt
+        format (a word followed by its phones) into a dict from lowercase
+        word to a list of pronunciations. Stress markers are dropped. """
+    lexicon = {}
+    for line in f:
+        if line.startswith(';;;') or line.strip() == '': continue
+        fields = line.split()
+        word = re.sub(r'\(\d+\)$', '', fields[0].lower())
+        phones = tuple([re.sub(r'\d$', '', p.upper()) for p in fields[1:]])
+        lexicon.setdefault(word, []).append(phones)
+    return lexicon
+
+def pronunciation_distance(lexicon, a, b):
+    return min([edit_distance(p, q) for p in lexicon[a] for q in lexicon[b]])
+
+def find_confusable(words, lexicon, threshold=1):
+    """ return (distance, word, word) for each pair of words whose
+        pronunciations differ in at most threshold phones, closest first """
+    known = [w for w in words if w in lexicon]
+    pairs = []
+    for i in range(len(known)):
+        for j in range(i + 1, len(known)):
+            d = pronunciation_distance(lexicon, known[i], known[j])
+            if d <= threshold:
+                pairs.append((d, known[i], known[j]))
+    return sorted(pairs)
+
+def nearest_keyword(word, keywords, lexicon=None):
+    """ the keyword that sounds (or, without a lexicon, is spelled) most
+        like word """
+    if lexicon is not None and word in lexicon:
+        candidates = [k for k in keywords if k in lexicon]
+        if len(candidates) > 0:
+            return min(candidates,
+                key=lambda k: pronunciation_distance(lexicon, word, k))
+    return min(keywords, key=lambda k: edit_distance(word, k))
+
+def find_failures(parser, lines):
+    """ parse each line; return the number of failed lines, and dicts that
+        count the words the failures happened at and the failed lines """
+    failed = 0
+    words = {}
+    utterances = {}
+    for line in lines:
+        if line.strip() == '': continue
+        try:
+            parse(parser, scan(line))
+        except GrammaticalError as e:
+            failed += 1
+            token = e.token
+            if token is not None:
+                word = token.type == 'ANY' and token.extra or token.type
+                words[word] = words.get(word, 0) + 1
+            utterance = ' '.join(line.lower().split())
+            utterances[utterance] = utterances.get(utterance, 0) + 1
+    return failed, words, utterances
+
+def most_common(counts, n):
+    return sorted(counts.items(), key=lambda (k, c): (-c, k))[:n]
+
+if __name__ == '__main__':
+    import argparse
+    from parse import SingleInputParser
+    args_parser = argparse.ArgumentParser(description='Report grammar '
+        'keywords that sound alike, and words that make commands fail')
+    args_parser.add_argument('-l', '--lexicon', help="Pronunciation lexicon "
+        "(CMUdict or Kaldi lexicon.txt format)")
+    args_parser.add_argument('-t', '--threshold', type=int, default=1,
+        help="Largest number of differing phones to report (default: 1)")
+    args_parser.add_argument('--log', help="Transcript log, one utterance "
+        "per line, to look for parse failures in")
+    args_parser.add_argument('-n', '--top', type=int, default=20,
+        help="Number of failures to list (default: 20)")
+    args = args_parser.parse_args()
+
+    parser = SingleInputParser()
+    keywords = get_terminals(parser)
+    lexicon = None
+    if args.lexicon:
+        lexicon = read_lexicon(open(args.lexicon))
+
+    if args.log:
+        find_keywords(parser)
+        total = len([l for l in open(args.log) if l.strip() != ''])
+        failed, words, utterances = find_failures(parser, open(args.log))
+
+    if lexicon is not None:
+        missing = [w for w in keywords if w not in lexicon]
+        if len(missing) > 0:
+            print 'Keywords not in the lexicon (cannot be recognized):'
+            print '   ', ' '.join(missing)
+        print 'Keywords that sound alike:'
+        for (d, a, b) in find_confusable(keywords, lexicon, args.threshold):
+            print '    %-12s %-12s %d' % (a, b, d)
+
+    if args.log:
+        print 'Parse failures: %d of %d utterances' % (failed, total)
+        print 'Words that commands failed at, with the closest keyword:'
+        for (word, count) in most_common(words, args.top):
+            print '    %5d %-16s %s' % (count, word,
+                nearest_keyword(word, keywords, lexicon))
+        print 'Most frequent failed utterances:'
+        for (utterance, count) in most_common(utterances, args.top):
+            print '    %5d %s' % (count, utterance)
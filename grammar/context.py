@@ -0,0 +1,87 @@
+# Tracks the window that has the focus, to pick the commands available.
+
+import subprocess, threading, time
+
+# window class -> trigger words of the plugins that are enabled in windows
+# of that class. Windows without a profile get all plugins.
+profiles = {}
+
+def set_profile(window_class, triggers):
+    profiles[window_class.lower()] = frozenset(triggers)
+
+set_profile('xterm', ['shell', 'git'])
+set_profile('gnome-terminal', ['shell', 'git'])
+set_profile('konsole', ['shell', 'git'])
+set_profile('emacs', ['git'])
+set_profile('firefox', [])
+set_profile('chromium', [])
+
+class XDoWindowProvider:
+    """ asks xdotool for the class of the focused window """
+
+    def window_class(self):
+        try:
+            return subprocess.check_output(['xdotool', 'getactivewindow',
+                'getwindowclassname']).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+
+    def focus_events(self):
+        """ a file that gets a line each time the focus changes, or None """
+        try:
+            return subprocess.Popen(['xprop', '-root', '-spy',
+                '_NET_ACTIVE_WINDOW'], stdout=subprocess.PIPE).stdout
+        except OSError:
+            return None
+
+class FixedWindowProvider:
+    """ pretends that a window of the given class always has the focus """
+
+    def __init__(self, window_class=''):
+        self.name = window_class
+
+    def window_class(self):
+        return self.name
+
+    def focus_events(self):
+        return None
+
+class WindowContext:
+    """ caches the focused window's class. If the provider reports focus
+        changes, the class is fetched again after each change; otherwise
+        it is fetched when it is older than max_age seconds. """
+
+    def __init__(self, provider, max_age=1.0):
+        self.provider = provider
+        self.max_age = max_age
+        self.name = None
+        self.stale = True
+        self.fetched = 0
+        self.events = provider.focus_events()
+        if self.events is not None:
+            thread = threading.Thread(target=self.watch)
+            thread.daemon = True
+            thread.start()
+
+    def watch(self):
+        # only sets a flag: self.name may be in use by window_class()
+        for line in iter(self.events.readline, ''):
+            self.stale = True
+        self.events = None  # the spy went away; go back to polling
+
+    def window_class(self):
+        name = self.name
+        if self.stale or name is None or (self.events is None and
+                time.time() - self.fetched > self.max_age):
+            # cleared before fetching, so a focus change during the
+            # fetch makes the next call fetch again
+            self.stale = False
+            name = self.provider.window_class()
+            self.name = name
+            self.fetched = time.time()
+        return name
+
+    def triggers(self):
+        """ plugin trigger words allowed in the focused window; None if
+            all plugins are allowed """
+        return profiles.get(self.window_class().lower())
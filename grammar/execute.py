@@ -1,24 +1,61 @@
 # Low-level execution of AST commands using xdotool.
 
-import os, platform
+import os, platform, time
 from spark import GenericASTTraversal
 from automators import XDoAutomator, CLIClickAutomator, NirCmdAutomator
 
+automators = {
+    'xdotool':  XDoAutomator,
+    'cliclick': CLIClickAutomator,
+    'nircmd':   NirCmdAutomator,
+}
+
+# set by configure()
+automator_name = None
+keymap = None
+batch = None
+
+def configure(name=None, nircmd_keymap=None, command_batch=None):
+    """ name is a key of automators, to use instead of the one for this
+        platform; nircmd_keymap replaces NirCmdAutomator.keymap;
+        command_batch, an automators.CommandBatch, runs the commands of
+        every automator """
+    global automator_name, keymap, batch
+    automator_name = name
+    keymap = nircmd_keymap
+    batch = command_batch
+
+def make_automator(real = True):
+    if automator_name is not None:
+        automator = automators[automator_name](real)
+    elif 'Linux' in platform.system():
+        automator = XDoAutomator(real)
+    elif 'Darwin' in platform.system():
+        automator = CLIClickAutomator(real)
+    elif 'Windows' in platform.system():
+        automator = NirCmdAutomator(real)
+    else:
+        print "No suitable automator for platform", platform.system()
+        return None
+    if keymap is not None and isinstance(automator, NirCmdAutomator):
+        automator.keymap = keymap
+    automator.batch = batch
+    return automator
+
 class ExecuteCommands(GenericASTTraversal):
-    def __init__(self, ast, real = True):
+    def __init__(self, ast, real = True, automator = None, macros = None):
+        """ automator, if given, is used instead of make_automator(real);
+            macros, a macro.Macros, is needed to run macro commands """
         GenericASTTraversal.__init__(self, ast)
         self.output = []
-        
-        if 'Linux' in platform.system():
-            self.automator = XDoAutomator(real)
-        elif 'Darwin' in platform.system():
-            self.automator = CLIClickAutomator(real)
-        elif 'Windows' in platform.system():
-            self.automator = NirCmdAutomator(real)
-        else:
-            print "No suitable automator for platform", platform.system()
+        if automator is None:
+            automator = make_automator(real)
+        self.automator = automator
+        self.macros = macros
 
         self.postorder_flat()
+        # when the keystrokes were ready to be sent, for latency.py
+        self.traversed = time.time()
         self.automator.flush()
 
     # a version of postorder which does not visit children recursively
@@ -61,6 +98,25 @@ class ExecuteCommands(GenericASTTraversal):
     def n_null(self, node):
         pass
 
+    def n_again(self, node):
+        if self.macros is None: return
+        for n in range(node.meta[0]):
+            self.replay(self.macros.last)
+    def n_macro(self, node):
+        if self.macros is None: return
+        action = node.meta[0]
+        if action == 'record':
+            self.macros.record(node.meta[1])
+        elif action == 'stop':
+            self.macros.stop()
+        elif action == 'play':
+            self.replay(self.macros.get(node.meta[1]))
+
+    def replay(self, commands):
+        """ command lines from an earlier utterance, as they are """
+        for command in commands:
+            self.automator.execute(command)
+
     def n_repeat(self, node):
         self.postorder_flat(node.children[0])
         char_list = self.automator.char_list[-1]
@@ -72,4 +128,12 @@ class ExecuteCommands(GenericASTTraversal):
 
 
 def execute(ast, real):
-    ExecuteCommands(ast, real)
+    """ run the commands in ast, and return the list of command lines
+        that the automator executed """
+    return ExecuteCommands(ast, real).automator.executed
+
+def replay(commands, real):
+    """ execute command lines returned by an earlier execute() """
+    automator = make_automator(real)
+    for command in commands:
+        automator.execute(command)
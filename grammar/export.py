@@ -0,0 +1,152 @@
+# Write the grammar in formats that let a speech recognizer restrict its
+# search to the commands we accept (W3C SRGS XML, JSGF, Kaldi FSTs).
+
+import os
+from xml.sax.saxutils import escape
+from parse import SingleInputParser
+from lm import start_symbol, reachable_rules
+
+def used_rules(parser):
+    """ the nonterminals that the start symbol uses, start symbol first """
+    return reachable_rules(parser.rules, [start_symbol(parser.rules)])
+
+def _symbols(tokens):
+    # END and the start marker are not words
+    return [t for t in tokens if t != 'END' and t != '|-']
+
+def write_srgs(parser, out):
+    rules = parser.rules
+    names = used_rules(parser)
+
+    def item(t):
+        if t in rules: return '<ruleref uri="#%s"/>' % t
+        if t == 'ANY': return '<ruleref special="GARBAGE"/>'
+        return escape(t)
+
+    def sequence(tokens):
+        symbols = _symbols(tokens)
+        if len(symbols) == 0: return '<ruleref special="NULL"/>'
+        return ' '.join([item(t) for t in symbols])
+
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<!DOCTYPE grammar PUBLIC "-//W3C//DTD GRAMMAR 1.0//EN"\n')
+    out.write('    "http://www.w3.org/TR/speech-grammar/grammar.dtd">\n')
+    out.write('<!-- Generated from parse.py by export.py; do not edit. -->\n')
+    out.write('<grammar xmlns="http://www.w3.org/2001/06/grammar" xml:lang="en"\n')
+    out.write('    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n')
+    out.write('    xsi:schemaLocation="http://www.w3.org/2001/06/grammar '
+        'http://www.w3.org/TR/speech-grammar/grammar.xsd"\n')
+    out.write('    version="1.0" mode="voice" root="%s">\n' % names[0])
+
+    for lhs in names:
+        out.write('\n')
+        if lhs == names[0]:
+            out.write('    <rule id="%s" scope="public">\n' % lhs)
+        else:
+            out.write('    <rule id="%s">\n' % lhs)
+        if len(rules[lhs]) == 1:
+            out.write('        %s\n' % sequence(rules[lhs][0][1]))
+        else:
+            out.write('        <one-of>\n')
+            for (name, tokens) in rules[lhs]:
+                out.write('            <item>%s</item>\n' % sequence(tokens))
+            out.write('        </one-of>\n')
+        out.write('    </rule>\n')
+    out.write('</grammar>\n')
+
+def write_jsgf(parser, out):
+    rules = parser.rules
+    names = used_rules(parser)
+
+    def item(t):
+        if t in rules: return '<%s>' % t
+        if t == 'ANY': return '"<unk>"'
+        return t
+
+    out.write('#JSGF V1.0;\n')
+    out.write('// Generated from parse.py by export.py; do not edit.\n')
+    out.write('grammar silvius;\n\n')
+    for lhs in names:
+        alternatives = []
+        for (name, tokens) in rules[lhs]:
+            symbols = _symbols(tokens)
+            if len(symbols) == 0:
+                alternatives.append('<NULL>')
+            else:
+                alternatives.append(' '.join([item(t) for t in symbols]))
+        if lhs == names[0]:
+            out.write('public ')
+        out.write('<%s> = %s;\n' % (lhs, ' | '.join(alternatives)))
+
+def write_fsts(parser, directory):
+    """ write one FST per nonterminal, in OpenFst text format, to
+        directory/<nonterminal>.txt. References to other nonterminals are
+        #nonterm:<name> labels, as used by Kaldi's GrammarFst. """
+    rules = parser.rules
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for lhs in used_rules(parser):
+        out = open(os.path.join(directory, lhs + '.txt'), 'w')
+        final = 1
+        state = 2
+        for (name, tokens) in rules[lhs]:
+            labels = []
+            for t in _symbols(tokens):
+                if t in rules: labels.append('#nonterm:' + t)
+                elif t == 'ANY': labels.append('<unk>')
+                else: labels.append(t)
+            if len(labels) == 0:
+                labels.append('<eps>')
+            previous = 0
+            for i in range(len(labels)):
+                if i == len(labels) - 1:
+                    target = final
+                else:
+                    target = state
+                    state += 1
+                out.write('%d\t%d\t%s\t%s\n' % (previous, target,
+                    labels[i], labels[i]))
+                previous = target
+        out.write('%d\n' % final)
+        out.close()
+
+writers = {
+    'srgs': write_srgs,
+    'jsgf': write_jsgf,
+}
+
+if __name__ == '__main__':
+    import argparse, sys
+    from StringIO import StringIO
+    args_parser = argparse.ArgumentParser(description='Write the grammar '
+        'in a format for speech recognizers')
+    args_parser.add_argument('-f', '--format', default='srgs',
+        choices=['srgs', 'jsgf', 'fst'], help="Output format (default: srgs)")
+    args_parser.add_argument('--check', action='store_true',
+        help="Compare the output file with the grammar instead of writing it")
+    args_parser.add_argument('output', nargs='?', help="Output file, or "
+        "directory for fst (default: stdout)")
+    args = args_parser.parse_args()
+
+    if args.check and not args.output:
+        args_parser.error('--check needs the file to compare with')
+    if args.check and args.format == 'fst':
+        args_parser.error('--check does not support fst')
+
+    parser = SingleInputParser()
+    if args.format == 'fst':
+        if not args.output: args_parser.error('fst needs an output directory')
+        write_fsts(parser, args.output)
+    elif args.check:
+        text = StringIO()
+        writers[args.format](parser, text)
+        if not os.path.exists(args.output) or \
+                open(args.output).read() != text.getvalue():
+            print '%s is out of date; run export.py to update it' % args.output
+            sys.exit(1)
+    elif args.output:
+        out = open(args.output, 'w')
+        writers[args.format](parser, out)
+        out.close()
+    else:
+        writers[args.format](parser, sys.stdout)
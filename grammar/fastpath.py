@@ -0,0 +1,110 @@
+# Lookup table for short commands, so they need not go through the parser.
+
+from copy import deepcopy
+from lm import find_short_sentences, start_symbol
+from scan import Token
+from parse import parse
+
+class FastPath:
+    """ maps every utterance of at most max_tokens keywords that the
+        grammar accepts to the AST the parser produces for it; anything
+        else falls back to the parser. If required is given, only
+        sentences using one of its words are in the table.
+
+        Parsing all of them takes most of a second, which would be spent
+        on every start, reload and plugin load, so the sentences are
+        only listed on the first lookup, and each is parsed the first
+        time it is looked up. build() parses them all at once. """
+
+    def __init__(self, parser, max_tokens=2, required=()):
+        self.parser = parser
+        self.max_tokens = max_tokens
+        self.required = set(required)
+        self.sentences = None
+        self.table = {}
+
+    def find_sentences(self):
+        parser = self.parser
+        sentences = find_short_sentences(parser.rules,
+            start_symbol(parser.rules), self.max_tokens, parser.stateful_rules)
+        if self.required:
+            sentences = set([words for words in sentences
+                if set(words) & self.required])
+        self.sentences = sentences
+
+    def add(self, words):
+        tokens = []
+        for i in range(len(words)):
+            tokens.append(Token(words[i], i + 1))
+        tokens.append(Token('END'))
+        self.table[words] = parse(self.parser, tokens)
+
+    def build(self):
+        """ put every sentence in the table now """
+        if self.sentences is None: self.find_sentences()
+        for words in self.sentences:
+            if words not in self.table:
+                self.add(words)
+
+    def lookup(self, tokens):
+        """ return the AST for tokens, or None if it is not in the table """
+        if getattr(self.parser, 'sleeping', False): return None
+        if len(tokens) > self.max_tokens + 1: return None
+
+        if self.sentences is None: self.find_sentences()
+        key = tuple([t.type for t in tokens if t.type != 'END'])
+        if key not in self.sentences: return None
+        if key not in self.table:
+            self.add(key)
+        # stateful rules were left out of the table
+        self.parser.touched_state = False
+        return deepcopy(self.table[key])
+
+    def parse(self, tokens):
+        ast = self.lookup(tokens)
+        if ast is None:
+            ast = parse(self.parser, tokens)
+        return ast
+
+def dump(ast):
+    """ nested tuple form of an AST, for comparing two trees """
+    if ast is None: return None
+    return (ast.type, repr(ast.meta), tuple([dump(c) for c in ast.children]))
+
+if __name__ == '__main__':
+    # check that the table agrees with the parser for every line in a
+    # file: python fastpath.py [--check] file. With --check, only
+    # mismatches are printed.
+    import sys, time
+    from scan import find_keywords, scan
+    from parse import SingleInputParser, GrammaticalError
+
+    check = '--check' in sys.argv[1:]
+    filename = [a for a in sys.argv[1:] if a != '--check'][0]
+    parser = SingleInputParser()
+    find_keywords(parser)
+    start = time.time()
+    fast_path = FastPath(parser)
+    fast_path.build()
+    if not check:
+        print 'built %d entries in %.3f s' % (len(fast_path.table),
+            time.time() - start)
+
+    hits = 0
+    failed = 0
+    for line in open(filename):
+        if line.strip() == '': continue
+        tokens = scan(line, False)
+        fast = fast_path.lookup(tokens)
+        if fast is None: continue
+        hits += 1
+        try:
+            slow = parse(parser, tokens)
+        except GrammaticalError as e:
+            slow = None
+        if dump(fast) != dump(slow):
+            failed += 1
+            print 'MISMATCH:', line.strip(), dump(fast), dump(slow)
+    if not check:
+        print '%d lines from the table, %d mismatches' % (hits, failed)
+    if failed: sys.exit(1)
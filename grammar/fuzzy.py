@@ -0,0 +1,83 @@
+# Corrects words that the recognizer got slightly wrong ("bravoo",
+# "charley") to the grammar keyword they were probably meant to be.
+
+from confusion import edit_distance
+from parse import GrammaticalError
+from scan import Token
+import logs
+
+log = logs.get('fuzzy')
+
+def _deletes(word, n):
+    """ word with up to n characters deleted, in all possible ways """
+    found = set([word])
+    last = found
+    for i in range(n):
+        last = set([w[:j] + w[j+1:] for w in last for j in range(len(w))])
+        found |= last
+    return found
+
+class DeleteIndex:
+    """ symmetric delete index: finds the words within an edit distance
+        of a given word without comparing it to every word. Two words
+        within distance n have a common variant with at most n characters
+        deleted from each. """
+
+    def __init__(self, words, max_distance=2):
+        self.max_distance = max_distance
+        self.index = {}
+        for w in words:
+            for variant in _deletes(w, max_distance):
+                self.index.setdefault(variant, set()).add(w)
+
+    def lookup(self, word, max_distance):
+        """ (distance, word) pairs within max_distance of word, closest
+            first """
+        max_distance = min(max_distance, self.max_distance)
+        candidates = set()
+        for variant in _deletes(word, max_distance):
+            candidates |= self.index.get(variant, set())
+        found = []
+        for w in candidates:
+            d = edit_distance(word, w)
+            if d <= max_distance:
+                found.append((d, w))
+        return sorted(found)
+
+class Corrector:
+    def __init__(self, keywords):
+        self.index = DeleteIndex(keywords)
+
+    def max_distance(self, word):
+        # short words are too easily turned into another word
+        if len(word) <= 3: return 0
+        if len(word) <= 5: return 1
+        return 2
+
+    def suggest(self, word):
+        """ the keyword word is closest to, or None if there is none or
+            several are equally close """
+        found = self.index.lookup(word, self.max_distance(word))
+        if len(found) == 0: return None
+        if len(found) > 1 and found[0][0] == found[1][0]: return None
+        return found[0][1]
+
+    def parse(self, parse, tokens, attempts=3):
+        """ return parse(tokens). If that fails at a word that is not a
+            keyword but is close to one, the word is replaced by that
+            keyword and the parse is tried again, up to attempts times. """
+        tokens = list(tokens)
+        for attempt in range(attempts + 1):
+            try:
+                return parse(tokens)
+            except GrammaticalError as e:
+                token = e.token
+                if attempt == attempts or token is None or token.type != 'ANY':
+                    raise
+                keyword = self.suggest(token.extra)
+                if keyword is None:
+                    raise
+                log.info("Correcting `%s' to `%s'", token.extra, keyword)
+                for i in range(len(tokens)):
+                    if tokens[i] is token:
+                        tokens[i] = Token(keyword, token.wordno)
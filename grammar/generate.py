@@ -0,0 +1,212 @@
+# Random sentences from the grammar, to test the parser on inputs that
+# nobody has typed into testcases.txt yet. Every sentence comes with
+# the derivation it was generated from; applying the parser's own p_
+# functions to that derivation gives the output the sentence should
+# have, which is compared with what scan, parse and execute produce.
+#
+# python generate.py [-n 1000] [--seed 1] [--print] [--scaling]
+
+import random, sys
+from scan import find_keywords, scan, Token
+from parse import SingleInputParser, GrammaticalError, parse
+from execute import ExecuteCommands
+from automators import XDoAutomator
+from lm import get_terminals
+
+# words for ANY tokens
+any_words = ['hello', 'world', 'quick', 'brown', 'lazy', 'river', 'stone',
+    'window', 'yellow', 'garden']
+
+def heights(rules):
+    """ for every nonterminal, the height of its lowest derivation tree;
+        used to end derivations that reach the depth limit """
+    height = {}
+    changes = True
+    while changes:
+        changes = False
+        for lhs in rules:
+            for (name, tokens) in rules[lhs]:
+                h = 1
+                for t in tokens:
+                    if t in rules:
+                        if t not in height: break
+                        h = max(h, height[t] + 1)
+                else:
+                    if lhs not in height or h < height[lhs]:
+                        height[lhs] = h
+                        changes = True
+    return height
+
+class Generator:
+    """ random derivations of a parser's grammar. Below max_depth every
+        rule of a nonterminal is equally likely, except that a rule
+        which refers to its own nonterminal (chained_commands,
+        word_repeat) is chosen with probability grow, so grow sets how
+        long chains get. Rules that use a nonterminal in exclude are
+        never chosen. """
+
+    def __init__(self, parser, seed=None, max_depth=8, grow=0.5,
+            exclude=None):
+        self.parser = parser
+        self.rules = parser.rules
+        self.random = random.Random(seed)
+        self.max_depth = max_depth
+        self.grow = grow
+        if exclude is None:
+            exclude = parser.stateful_rules
+        self.height = heights(self.rules)
+        self.choices = {}
+        for lhs in self.rules:
+            usable = [r for r in self.rules[lhs]
+                if not [t for t in r[1] if t in exclude]]
+            self.choices[lhs] = usable
+        keywords = get_terminals(parser)
+        self.words = [w for w in any_words if w not in keywords]
+
+    def choose(self, lhs, depth):
+        rules = self.choices[lhs]
+        if depth >= self.max_depth:
+            lowest = min([self.rule_height(r) for r in rules])
+            rules = [r for r in rules if self.rule_height(r) == lowest]
+            return self.random.choice(rules)
+        growing = [r for r in rules if lhs in r[1]]
+        if growing and len(growing) < len(rules):
+            if self.random.random() < self.grow:
+                rules = growing
+            else:
+                rules = [r for r in rules if lhs not in r[1]]
+        return self.random.choice(rules)
+
+    def rule_height(self, rule):
+        return max([1] + [self.height[t] + 1 for t in rule[1]
+            if t in self.rules])
+
+    def derive(self, symbol, depth=0):
+        """ a derivation tree: a nonterminal is (rule, children), a
+            terminal is a Token """
+        if symbol not in self.rules:
+            if symbol == 'ANY':
+                return Token('ANY', extra=self.random.choice(self.words))
+            return Token(symbol)
+        rule = self.choose(symbol, depth)
+        return (rule, [self.derive(t, depth + 1) for t in rule[1]])
+
+    def sentence(self, start='single_input'):
+        """ (sentence, derivation) """
+        tree = self.derive(start)
+        return (' '.join(words(tree)), tree)
+
+def words(tree):
+    if not isinstance(tree, tuple):
+        if tree.type == 'END': return []
+        return [tree.extra or tree.type]
+    result = []
+    for child in tree[1]:
+        result += words(child)
+    return result
+
+def evaluate(parser, tree):
+    """ the value of a derivation tree under parser's p_ functions, as
+        parse() would return it if it found this derivation """
+    if not isinstance(tree, tuple):
+        # a new token, since some p_ functions change their tokens
+        return Token(tree.type, tree.wordno, tree.extra)
+    rule, children = tree
+    args = [evaluate(parser, child) for child in children]
+    return parser.rule2func[rule](args)
+
+def commands(ast):
+    automator = XDoAutomator(False)
+    ExecuteCommands(ast, automator=automator)
+    return automator.executed
+
+def check(parser, line, tree):
+    """ None if line gives the commands its derivation says it should,
+        or else a description of the difference """
+    try:
+        ast = parse(parser, scan(line, False))
+    except GrammaticalError as e:
+        return 'error: %s' % e
+    # the grammar accepts some commands that the executor cannot run
+    try:
+        expected = commands(evaluate(parser, tree))
+        got = commands(ast)
+    except Exception as e:
+        return 'cannot execute: %s: %s' % (e.__class__.__name__, e)
+    if got != expected:
+        return 'got %s, expected %s' % (got, expected)
+    return None
+
+def scaling(parser, generator, count, width=10, repeat=3):
+    """ lines of a table of parse time and Earley items against the
+        number of tokens, over count sentences of every grow setting """
+    from benchmark import best_time, earley_stats
+    from latency import percentile
+    buckets = {}
+    for grow in (0.5, 0.7, 0.8, 0.9, 0.95):
+        generator.grow = grow
+        for i in range(count):
+            line, tree = generator.sentence()
+            lists = [scan(line, False) for j in range(repeat)]
+            try:
+                t, ast = best_time(lambda: parse(parser, lists.pop()), repeat)
+            except GrammaticalError:
+                continue
+            r = earley_stats(parser)
+            r['parse'] = t
+            buckets.setdefault((len(parser.sets) - 1) // width, []).append(r)
+    lines = ['%-10s %6s %9s %9s %9s' % ('tokens', 'n', 'p50 us', 'max us',
+        'items')]
+    for b in sorted(buckets):
+        times = [r['parse'] for r in buckets[b]]
+        items = [r['items'] for r in buckets[b]]
+        lines.append('%-10s %6d %9.1f %9.1f %9d' % ('%d-%d' % (b * width,
+            b * width + width - 1), len(times), percentile(times, 50) * 1e6,
+            max(times) * 1e6, percentile(items, 50)))
+    return lines
+
+if __name__ == '__main__':
+    import argparse
+    arg_parser = argparse.ArgumentParser(
+        description='Check the parser on random sentences of the grammar')
+    arg_parser.add_argument('-n', '--count', type=int, default=1000,
+        help='Number of sentences (default: 1000)')
+    arg_parser.add_argument('--seed', type=int, help='Random seed')
+    arg_parser.add_argument('--max-depth', type=int,
+        help='Depth of derivation trees after which they are ended as '
+             'soon as possible (default: 8, or 100 with --scaling)')
+    arg_parser.add_argument('--grow', type=float, default=0.5,
+        help='Probability of continuing a chain of commands or words '
+             '(default: 0.5)')
+    arg_parser.add_argument('--print', dest='print_only',
+        action='store_true', help='Only print the sentences')
+    arg_parser.add_argument('--scaling', action='store_true',
+        help='Print parse time against sentence length, over -n sentences '
+             'for each of several --grow settings')
+    args = arg_parser.parse_args()
+
+    parser = SingleInputParser()
+    find_keywords(parser)
+    if args.max_depth is None:
+        args.max_depth = args.scaling and 100 or 8
+    generator = Generator(parser, args.seed, args.max_depth, args.grow)
+
+    if args.scaling:
+        for line in scaling(parser, generator, args.count):
+            print line
+        sys.exit(0)
+
+    failed = 0
+    for i in range(args.count):
+        line, tree = generator.sentence()
+        if args.print_only:
+            print line
+            continue
+        failure = check(parser, line, tree)
+        if failure is not None:
+            failed += 1
+            print '%s: %s' % (line, failure)
+    if not args.print_only:
+        print '%d sentences: %s' % (args.count,
+            failed and '%d failed' % failed or 'ok')
+    sys.exit(failed and 1 or 0)
@@ -0,0 +1,115 @@
+# Per-utterance latency breakdown. Each utterance is written as one JSON
+# object per line, with the time spent in each stage in seconds.
+
+import json, math, time
+
+def percentile(values, p):
+    """ nearest-rank percentile, p in 0..100 """
+    values = sorted(values)
+    if len(values) == 0: return None
+    k = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[min(max(k, 0), len(values) - 1)]
+
+class LatencyLog:
+    """ start() begins an utterance; mark(stage) ends a stage, which
+        began at the previous mark; finish() writes the utterance to f,
+        if given. Durations are kept for summary(). """
+
+    def __init__(self, f=None):
+        self.f = f
+        self.record = None
+        self.durations = {}
+        self.order = []
+        self.count = 0
+
+    def start(self, **fields):
+        self.count += 1
+        self.last = time.time()
+        self.record = dict(fields)
+        self.record['utterance'] = self.count
+        self.record['start'] = self.last
+
+    def mark(self, stage, t=None):
+        """ end stage at time t (default: now) """
+        if t is None: t = time.time()
+        self.record[stage] = self.record.get(stage, 0.0) + t - self.last
+        if stage not in self.order:
+            self.order.append(stage)
+        self.last = t
+
+    def finish(self):
+        record = self.record
+        record['total'] = self.last - record['start']
+        for stage in self.order + ['total']:
+            if stage in record:
+                self.durations.setdefault(stage, []).append(record[stage])
+        if self.f is not None:
+            self.f.write(json.dumps(record, sort_keys=True) + '\n')
+            self.f.flush()
+        self.record = None
+
+    def summary(self):
+        return summarize(self.durations, self.order + ['total'])
+
+def summarize(durations, order):
+    """ table of percentiles in milliseconds, one line per stage """
+    lines = ['%-12s %6s %8s %8s %8s %8s'
+        % ('stage', 'n', 'p50', 'p90', 'p99', 'max')]
+    for stage in order:
+        values = durations.get(stage, [])
+        if len(values) == 0: continue
+        lines.append('%-12s %6d %8.2f %8.2f %8.2f %8.2f' % (stage,
+            len(values), 1000 * percentile(values, 50),
+            1000 * percentile(values, 90), 1000 * percentile(values, 99),
+            1000 * max(values)))
+    return '\n'.join(lines)
+
+def read_log(f):
+    return [json.loads(line) for line in f if line.strip()]
+
+def join(mic_records, main_records):
+    """ add the recognizer's stages to each main.py record: the final
+        result that main.py read is the last one mic.py printed before,
+        unless an earlier record was already matched with it """
+    i = 0
+    used = 0
+    joined = []
+    for record in sorted(main_records, key=lambda r: r['start']):
+        while i < len(mic_records) and \
+                mic_records[i]['final'] <= record['start']:
+            i += 1
+        record = dict(record)
+        if i > used:
+            used = i
+            mic = mic_records[i - 1]
+            record['pipe'] = record['start'] - mic['final']
+            record['total'] += record['pipe']
+            if mic.get('decode') is not None:
+                record['decode'] = mic['decode']
+                record['total'] += record['decode']
+        joined.append(record)
+    return joined
+
+if __name__ == '__main__':
+    # percentiles from the logs written by main.py and, optionally,
+    # mic.py: python latency.py [--mic mic.log] main.log
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Summarize latency logs of main.py and mic.py')
+    parser.add_argument('--mic', help='Log written by mic.py --latency-log')
+    parser.add_argument('log', help='Log written by main.py --latency-log')
+    args = parser.parse_args()
+
+    records = read_log(open(args.log))
+    order = ['scan', 'parse', 'print', 'execute', 'keystrokes', 'replay']
+    if args.mic:
+        mic_records = read_log(open(args.mic))
+        mic_records.sort(key=lambda r: r['final'])
+        records = join(mic_records, records)
+        order = ['decode', 'pipe'] + order
+    durations = {}
+    for record in records:
+        for stage in order + ['total']:
+            if stage in record:
+                durations.setdefault(stage, []).append(record[stage])
+    print summarize(durations, order + ['total'])
@@ -2,97 +2,392 @@
 
 from parse import parse
 from parse import SingleInputParser
-from copy import deepcopy
+import math, time, weakref
 
-def find_terminals(rules, visited, which, found):
-    if which in visited: return
-    visited[which] = 1
+def start_symbol(rules):
+    """ the nonterminal that the parser of rules starts from """
+    return rules['START'][0][1][1]
 
-    for r in rules[which]:
-        (name, tokens) = r
-        for t in tokens:
-            if t in rules:
-                find_terminals(rules, visited, t, found)
-            elif t != 'END' and t != 'ANY' and t != '|-':
-                found.append(t)
+def reachable_rules(rules, roots):
+    """ the nonterminals that the nonterminals in roots use, directly or
+        not, roots first """
+    found = list(roots)
+    for lhs in found:
+        for (name, tokens) in rules[lhs]:
+            for t in tokens:
+                if t in rules and t not in found:
+                    found.append(t)
+    return found
 
-def find_sequences(rules, visited, which, found=[], level=0):
-    if which in visited and visited[which]: return
-    visited[which] = 1
+def analyze(rules):
+    """ return a dict from each nonterminal in rules to the set of
+        keywords used anywhere in what it derives. ANY and END are token
+        types, not keywords. Computed by iterating to a fixed point
+        instead of recursing. """
+    terminals = {}
+    for lhs in rules:
+        terminals[lhs] = set()
 
-    for r in rules[which]:
-        (name, tokens) = r
-        new_level = level
-        new_found = deepcopy(found)
-        for t in tokens:
-            if t in rules:
-                find_sequences(rules, visited, t, new_found, new_level)
-            elif t != 'END' and t != '|-':
-                if len(new_found) <= new_level: new_found.append([])
-                new_found[new_level].append(t)
-                new_level += 1
-        #print new_found
-    visited[which] = 0
-
-def build_n_grams(rules, n_max):
-    gram = [{}]
-    for n in range(1, n_max+1):
-        gram.append({})
-        # leaf rules
-        for which in rules:
-            gram[n][which] = []
-            for r in rules[which]:
-                (name, tokens) = r
-                fragment = []
+    changes = True
+    while changes:
+        changes = False
+        for lhs in rules:
+            found = terminals[lhs]
+            before = len(found)
+            for (name, tokens) in rules[lhs]:
                 for t in tokens:
                     if t in rules:
-                        if len(fragment) > 0 and n - len(fragment) > 0:
-                            for q in gram[n - len(fragment)][t]:
-                                qq = fragment[:]
-                                qq.extend(q)
-                                gram[n][which].append(qq)
-                        #pass
-                    elif t != 'END' and t != '|-':
-                        fragment.append(t)
-                if len(fragment) == n:
-                    gram[n][which].append(fragment)
-
-        # self-recursion
-        for which in rules:
-            for r in rules[which]:
-                (name, tokens) = r
-                if which in tokens:
-                    for i in range(1, n):
-                        for q in gram[n - i][which]:
-                            for z in gram[i][which]:
-                                qq = q[:]
-                                qq.extend(z)
-                                if qq not in gram[n][which]:
-                                    gram[n][which].append(qq)
-                    break
-
-        # propagate to other rules (left recursion)
-        for which in rules:
-            for r in rules[which]:
+                        found |= terminals[t]
+                    elif t not in ('END', 'ANY', '|-'):
+                        found.add(t)
+            if len(found) != before:
+                changes = True
+    return terminals
+
+def find_terminals(rules, which='START'):
+    """ the set of keywords that can occur in what which derives """
+    return analyze(rules)[which]
+
+def find_short_sentences(rules, which, max_len, exclude=()):
+    """ return the set of word sequences of at most max_len words that can
+        be derived from the nonterminal which. Sequences that need an ANY
+        token, or that go through one of the nonterminals in exclude, are
+        left out. END and |- are not counted as words. """
+    # found[lhs][n] holds the sequences of exactly n words
+    found = {}
+    for lhs in rules:
+        found[lhs] = [set() for n in range(max_len + 1)]
+
+    changes = True
+    while changes:
+        changes = False
+        for lhs in rules:
+            if lhs in exclude: continue
+            for r in rules[lhs]:
                 (name, tokens) = r
-                fragment = []
+                partial = set([()])
                 for t in tokens:
-                    if t == which: continue
                     if t in rules:
-                        if n - len(fragment) > 0:
-                            for q in gram[n - len(fragment)][t]:
-                                qq = fragment[:]
-                                qq.extend(q)
-                                if qq not in gram[n][which]:
-                                    gram[n][which].append(qq)
-                    elif t != 'END' and t != '|-':
-                        fragment.append(t)
-    #print gram
-    for g in gram[n]:
-        for seq in gram[n][g]:
-            for word in seq:
-                print word,
-            print
+                        by_len = found[t]
+                    elif t == 'END' or t == '|-':
+                        continue
+                    elif t == 'ANY':
+                        by_len = []
+                    else:
+                        by_len = [set(), set([(t,)])]
+                    extended = set()
+                    for p in partial:
+                        for n in range(min(len(by_len), max_len - len(p) + 1)):
+                            for o in by_len[n]:
+                                extended.add(p + o)
+                    partial = extended
+                    if len(partial) == 0: break
+                for p in partial:
+                    if p not in found[lhs][len(p)]:
+                        found[lhs][len(p)].add(p)
+                        changes = True
+
+    sentences = set()
+    for n in range(max_len + 1):
+        sentences |= found[which][n]
+    return sentences
+
+def _cross(left, right, n, found):
+    """ add the n-grams of a + b, for a in left and b in right, that use
+        words from both a and b """
+    for k in range(1, n):
+        ends = set([a[-k:] for a in left if len(a) >= k])
+        if len(ends) == 0: continue
+        starts = set([b[:n-k] for b in right if len(b) >= n-k])
+        for a in ends:
+            for b in starts:
+                found.add(a + b)
+
+class _Yields:
+    """ what find_n_grams needs to know about the word sequences that a
+        symbol derives: the sequences shorter than n-1 words, and the
+        first and last n-1 words of the longer ones """
+    def __init__(self, short=(), heads=(), tails=()):
+        self.short = set(short)
+        self.heads = set(heads)
+        self.tails = set(tails)
+
+    def empty(self):
+        return not (self.short or self.heads or self.tails)
+
+    def update(self, other):
+        self.short |= other.short
+        self.heads |= other.heads
+        self.tails |= other.tails
+
+    def __or__(self, other):
+        return _Yields(self.short | other.short, self.heads | other.heads,
+            self.tails | other.tails)
+
+    def __sub__(self, other):
+        return _Yields(self.short - other.short, self.heads - other.heads,
+            self.tails - other.tails)
+
+def _concat(symbols, n, pool, grams):
+    """ _Yields for the sequence of symbols, each given as its _Yields.
+        n-grams that span two symbols are added to grams. """
+    m = n - 1
+    acc = _Yields()
+    if m > 0:
+        acc.short.add(())
+    else:
+        acc.heads.add(())
+        acc.tails.add(())
+
+    for y in symbols:
+        if y.empty() or acc.empty():
+            return _Yields()  # nothing (new) derived from the symbol yet
+        new = _Yields()
+        for a in acc.short:
+            for b in y.short:
+                seq = a + b
+                if len(seq) < m:
+                    new.short.add(pool.setdefault(seq, seq))
+                else:
+                    new.heads.add(pool.setdefault(seq[:m], seq[:m]))
+                    new.tails.add(pool.setdefault(seq[-m:], seq[-m:]))
+            for b in y.heads:
+                seq = (a + b)[:m]
+                new.heads.add(pool.setdefault(seq, seq))
+        for a in acc.tails:
+            for b in y.short:
+                seq = (a + b)[len(a)+len(b)-m:]
+                new.tails.add(pool.setdefault(seq, seq))
+        new.heads |= acc.heads
+        new.tails |= y.tails
+        _cross(acc.short | acc.tails, y.short | y.heads, n, grams)
+        acc = new
+    return acc
+
+def command_units(rules):
+    """ the nonterminals whose word sequences are the sentences of the
+        language model: single_command, which chained_commands repeats,
+        and the other commands that the start symbol derives (sleep and
+        macro commands). Whole chains are not expanded: their n-grams
+        would be every combination of the end of one command with the
+        start of the next, far more than the commands themselves. """
+    units = ['single_command']
+    for (name, tokens) in rules[start_symbol(rules)]:
+        for t in tokens:
+            if t in rules and t != 'chained_commands' and t not in units:
+                units.append(t)
+    return units
+
+def find_n_grams(rules, n, units=None):
+    """ return the set of n-grams (tuples of n words) that occur in the
+        commands that units derive (default: command_units), with each
+        command surrounded by <s> and </s>, and for n = 2 the bigrams
+        from the last word of a single_command to the first word of the
+        next one in a chain. ANY is written as <unk>. At most n-1 words
+        are kept of each word sequence that a nonterminal derives, so
+        this terminates for recursive rules, and takes time proportional
+        to the number of n-grams rather than the number of sentences. """
+    grams, commands, links = _find_n_grams(rules, n, units)
+    if n == 2:
+        grams |= links
+    return grams
+
+def find_all_n_grams(rules, n_max, units=None):
+    """ a list with, for each order n from 1 to n_max, the set that
+        find_n_grams(rules, n, units) returns (and an empty set for n = 0).
+        Only order n_max is computed from the rules. Every shorter
+        n-gram is the start or end of an (n+1)-gram, or part of a
+        command of fewer than n_max words; those commands, and the first
+        and last n_max-1 words of the longer ones, are known from the
+        same computation, as are the bigrams between chained commands. """
+    grams, commands, links = _find_n_grams(rules, n_max, units)
+    orders = [set() for n in range(n_max + 1)]
+    orders[n_max] = grams
+    short = commands.short | commands.heads | commands.tails
+    for n in range(n_max - 1, 0, -1):
+        # an n-gram that is not the start of an (n+1)-gram ends a command
+        found = set([gram[:n] for gram in orders[n+1]])
+        found.update([gram[1:] for gram in orders[n+1] if gram[-1] == '</s>'])
+        orders[n] = found
+        for seq in short:
+            for i in range(len(seq) - n + 1):
+                found.add(seq[i:i+n])
+    if n_max >= 2:
+        orders[2] |= links
+    return orders
+
+def _links(command):
+    """ the bigrams from the last word of one command to the first word
+        of another, given the _Yields of the commands """
+    first = set([seq[0] for seq in command.short | command.heads if seq])
+    last = set([seq[-1] for seq in command.short | command.tails if seq])
+    return set([(a, b) for a in last for b in first])
+
+def _find_n_grams(rules, n, units):
+    """ (n-grams, _Yields of the commands with <s> and </s>, bigrams
+        between chained commands) """
+    if units is None:
+        units = command_units(rules)
+    pool = {}
+    grams = set()
+    terminals = {}
+    def terminal(t):
+        if t not in terminals:
+            y = _Yields()
+            word = intern(t == 'ANY' and '<unk>' or t)
+            if n == 1:
+                y.heads.add(())
+                y.tails.add(())
+                grams.add((word,))
+            elif n == 2:
+                y.heads.add((word,))
+                y.tails.add((word,))
+            else:
+                y.short.add((word,))
+            terminals[t] = y
+        return terminals[t]
+
+    # only the rules that can be used in a command
+    reachable = reachable_rules(rules, units)
+
+    # (old, new, full) _Yields for each symbol: evaluated semi-naively,
+    # each round only combines rules' symbols in ways that use at least
+    # one sequence found in the previous round
+    nothing = _Yields()
+    versions = {}
+    for lhs in reachable:
+        versions[lhs] = (nothing, nothing, nothing)
+    epsilon = _concat([], n, pool, grams)
+    def lookup(t):
+        if t in versions: return versions[t]
+        if t == 'END' or t == '|-': y = epsilon
+        else: y = terminal(t)
+        return (nothing, y, y)
+
+    first = True
+    changes = True
+    while changes:
+        found = {}
+        for lhs in reachable:
+            found[lhs] = _Yields()
+            for (name, tokens) in rules[lhs]:
+                if first and len(tokens) == 0:
+                    found[lhs].update(epsilon)
+                symbols = [lookup(t) for t in tokens]
+                for i in range(len(symbols)):
+                    if symbols[i][1].empty(): continue
+                    parts = [old for (old, new, full) in symbols[:i]]
+                    parts.append(symbols[i][1])
+                    parts.extend([full for (old, new, full) in symbols[i+1:]])
+                    found[lhs].update(_concat(parts, n, pool, grams))
+
+        changes = False
+        for lhs in reachable:
+            (old, new, full) = versions[lhs]
+            new = found[lhs] - full
+            versions[lhs] = (full, new, full | new)
+            if not new.empty():
+                changes = True
+        for t in terminals.keys() + ['END', '|-']:
+            # terminals only count as new in the first round
+            versions[t] = (lookup(t)[2], nothing, lookup(t)[2])
+        first = False
+
+    commands = _Yields()
+    for unit in units:
+        commands |= _concat([terminal('<s>'), versions[unit][2],
+            terminal('</s>')], n, pool, grams)
+    links = set()
+    if 'single_command' in versions:
+        links = _links(versions['single_command'][2])
+    return (grams, commands, links)
+
+def write_counts(rules, n_max, out, units=None):
+    """ write the n-grams of orders 1 to n_max in the count file format
+        of SRILM's ngram-count (words, a tab, the count), one line at a
+        time. Each n-gram the grammar allows is counted once. Returns
+        the time spent finding all of them, and writing each order. """
+    start = time.time()
+    orders = find_all_n_grams(rules, n_max, units)
+    timing = [time.time() - start]
+    for n in range(1, n_max+1):
+        start = time.time()
+        for gram in orders[n]:
+            out.write('%s\t1\n' % ' '.join(gram))
+        timing.append(time.time() - start)
+    return timing
+
+def count_n_grams(rules, n_max, usage=None, weight=1.0, units=None):
+    """ return a list with, for each order n from 1 to n_max, a dict from
+        n-gram to count. Every n-gram the grammar allows counts once.
+        usage, if given, is a sequence of utterances that were actually
+        spoken (e.g. lines of a log file); each n-gram in them adds weight
+        to its count. Their words that the grammar does not know become
+        <unk>. """
+    counts = [dict.fromkeys(grams, 1.0)
+        for grams in find_all_n_grams(rules, n_max, units)]
+
+    if usage is not None:
+        vocabulary = set([gram[0] for gram in counts[1]])
+        for line in usage:
+            words = ['<s>']
+            for w in line.lower().split():
+                if w not in vocabulary: w = '<unk>'
+                words.append(w)
+            words.append('</s>')
+            for n in range(1, n_max+1):
+                for i in range(len(words) - n + 1):
+                    gram = tuple(words[i:i+n])
+                    counts[n][gram] = counts[n].get(gram, 0) + weight
+    return counts
+
+def write_arpa(counts, out):
+    """ write a backoff language model in ARPA format, estimated from
+        counts (as returned by count_n_grams) with Witten-Bell
+        discounting """
+    n_max = len(counts) - 1
+    prob = [{}, {}]
+    total = sum([c for (gram, c) in counts[1].items() if gram != ('<s>',)])
+    for gram, c in counts[1].items():
+        prob[1][gram] = c / total
+
+    # P(w | h) = c(h w) / (c(h) + T(h)), T(h) = number of different w
+    for n in range(2, n_max+1):
+        context = {}
+        for gram, c in counts[n].items():
+            (c_h, t_h) = context.get(gram[:-1], (0, 0))
+            context[gram[:-1]] = (c_h + c, t_h + 1)
+        prob.append({})
+        for gram, c in counts[n].items():
+            (c_h, t_h) = context[gram[:-1]]
+            prob[n][gram] = c / (c_h + t_h)
+
+    # backoff weights give the unused probability mass of h to the
+    # n-grams that are only seen with a shorter history
+    backoff = [{}]
+    for n in range(1, n_max):
+        left = {}
+        for gram, p in prob[n+1].items():
+            (seen, lower) = left.get(gram[:-1], (0.0, 0.0))
+            left[gram[:-1]] = (seen + p, lower + prob[n][gram[1:]])
+        backoff.append({})
+        for h, (seen, lower) in left.items():
+            backoff[n][h] = max(1.0 - seen, 1e-10) / max(1.0 - lower, 1e-10)
+
+    out.write('\n\\data\\\n')
+    for n in range(1, n_max+1):
+        out.write('ngram %d=%d\n' % (n, len(prob[n])))
+    for n in range(1, n_max+1):
+        out.write('\n\\%d-grams:\n' % n)
+        for gram in sorted(prob[n]):
+            if gram == ('<s>',):
+                line = '-99\t<s>'
+            else:
+                line = '%.6f\t%s' % (math.log10(prob[n][gram]), ' '.join(gram))
+            if n < n_max:
+                line += '\t%.6f' % math.log10(backoff[n].get(gram, 1.0))
+            out.write(line + '\n')
+    out.write('\n\\end\\\n')
 
 def make_lm(rules, visited, which, prefix):
     if which in visited: return
@@ -109,27 +404,66 @@ def make_lm(rules, visited, which, prefix):
                 print prefix, t
                 new_prefix.append(t)
 
+# parser -> its keywords, for as long as the parser is in use
+_keywords = weakref.WeakKeyDictionary()
+
 def get_terminals(parser):
-    visited = {}
-    terminals = []
-    find_terminals(parser.rules, visited, 'START', terminals)
-    keywords = set(terminals)
-    return sorted(keywords)
+    """ the sorted keywords of parser, worked out once per parser """
+    if parser not in _keywords:
+        _keywords[parser] = sorted(find_terminals(parser.rules))
+    return list(_keywords[parser])
 
-if __name__ == '__main__':
-    import sys
-    parser = SingleInputParser()
-    #for rule in parser.rules:
-    #    print rule, parser.rules[rule]
+def check_vocabulary(parser, unigrams):
+    """ (missing, extra): the keywords of parser that are not among the
+        words of unigrams, and the words that are not keywords """
+    words = set([gram[0] for gram in unigrams]) - set(['<s>', '</s>', '<unk>'])
+    keywords = set(get_terminals(parser))
+    return (sorted(keywords - words), sorted(words - keywords))
 
-    visited = {}
-    #make_lm(parser.rules, visited, 'START', [])
-    terminals = []
-    find_terminals(parser.rules, visited, 'START', terminals)
-    #print terminals
+if __name__ == '__main__':
+    import argparse, sys
+    args_parser = argparse.ArgumentParser(description='Write the n-grams '
+        'allowed by the grammar, or a language model built from them')
+    args_parser.add_argument('order', type=int, help="Largest n-gram order")
+    args_parser.add_argument('output', nargs='?', help="Output file (default: stdout)")
+    args_parser.add_argument('--arpa', action='store_true',
+        help="Write an ARPA language model instead of n-gram counts")
+    args_parser.add_argument('--usage', help="Log of spoken commands, one "
+        "utterance per line, to weight the language model with")
+    args_parser.add_argument('--usage-weight', type=float, default=1.0,
+        help="Count added for each n-gram occurrence in the usage log")
+    args_parser.add_argument('--check', action='store_true',
+        help="Write nothing; fail if the words of the n-grams are not "
+             "exactly the keywords of the grammar")
+    args = args_parser.parse_args()
 
-    visited = {}
-    find_sequences(parser.rules, visited, 'START')
+    parser = SingleInputParser()
+    if args.check:
+        orders = find_all_n_grams(parser.rules, args.order)
+        missing, extra = check_vocabulary(parser, orders[1])
+        if missing:
+            print 'keywords without n-grams:', ' '.join(missing)
+        if extra:
+            print 'n-gram words that are not keywords:', ' '.join(extra)
+        sys.exit((missing or extra) and 1 or 0)
+    if args.output:
+        out = open(args.output, 'w')
+    else:
+        out = sys.stdout
 
-    build_n_grams(parser.rules, int(sys.argv[1]))
+    if args.arpa:
+        usage = None
+        if args.usage:
+            usage = open(args.usage).readlines()
+        start = time.time()
+        counts = count_n_grams(parser.rules, args.order, usage, args.usage_weight)
+        write_arpa(counts, out)
+        print >> sys.stderr, 'language model: %.3f s' % (time.time() - start)
+    else:
+        timing = write_counts(parser.rules, args.order, out)
+        print >> sys.stderr, 'n-grams: %.3f s' % timing[0]
+        for n in range(1, len(timing)):
+            print >> sys.stderr, 'writing %d-grams: %.3f s' % (n, timing[n])
 
+    if out != sys.stdout:
+        out.close()
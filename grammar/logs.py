@@ -0,0 +1,107 @@
+# Logging for the recognition pipeline. Messages below the level are
+# dropped before they are formatted, and the rest are written to the
+# terminal by a background thread, so that parsing and executing never
+# wait for the terminal.
+#
+#   log = logs.get('scan')
+#   log.debug('%s', tokens)     # formatted only if debug is enabled
+
+import json, logging, sys, threading, Queue
+
+levels = {
+    'debug':    logging.DEBUG,
+    'info':     logging.INFO,
+    'warning':  logging.WARNING,
+    'error':    logging.ERROR,
+}
+
+root = logging.getLogger('silvius')
+# until setup() is called, e.g. in tools that import the parser
+root.addHandler(logging.NullHandler())
+
+def get(name):
+    return logging.getLogger('silvius.' + name)
+
+class JSONFormatter(logging.Formatter):
+    """ one JSON object per message, with its time, level, logger and
+        text, and the fields passed as extra={'fields': {...}} """
+
+    def format(self, record):
+        entry = {
+            't': record.created,
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, sort_keys=True)
+
+class BackgroundHandler(logging.Handler):
+    """ formats each message when it is logged, because its arguments
+        (tokens, ASTs) may change afterwards, but writes it to stream
+        from a separate thread. The stream is flushed whenever there is
+        nothing left to write. """
+
+    def __init__(self, stream=None):
+        logging.Handler.__init__(self)
+        if stream is None:
+            stream = sys.stderr
+        self.stream = stream
+        self.queue = Queue.Queue()
+        self.thread = threading.Thread(target=self.write_messages)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def emit(self, record):
+        try:
+            self.queue.put(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+    def write_messages(self):
+        while True:
+            text = self.queue.get()
+            try:
+                if text is None: return
+                self.stream.write(text)
+                if self.queue.empty():
+                    self.stream.flush()
+            except IOError:
+                pass
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """ wait until everything logged so far has been written """
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        logging.Handler.close(self)
+
+def setup(level='info', format='text', stream=None, background=True):
+    """ send the pipeline's messages at or above level (a key of levels)
+        to stream (default: stderr), as plain text or as JSON """
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    if background:
+        handler = BackgroundHandler(stream)
+    else:
+        handler = logging.StreamHandler(stream)
+    if format == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    root.addHandler(handler)
+    root.setLevel(levels[level])
+    root.propagate = False
+
+def flush():
+    for handler in root.handlers:
+        handler.flush()
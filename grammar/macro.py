@@ -0,0 +1,69 @@
+# Macros: the automator command lines that earlier utterances produced,
+# kept so they can be run again without scanning or parsing anything.
+#
+#   again [N]               the last utterance's commands, N times
+#   macro record NAME       start collecting the commands of what follows
+#   macro stop              save them as NAME
+#   macro play NAME
+
+import json, os
+import logs
+
+log = logs.get('macro')
+
+class Macros:
+    """ the commands of the last utterance, and named lists of commands.
+        Named macros are read from and saved to filename, if given, so
+        they are kept between sessions. """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.last = []
+        self.recording = None
+        self.macros = {}
+        if filename is not None and os.path.exists(filename):
+            try:
+                self.macros = json.load(open(filename))
+            except (IOError, ValueError) as e:
+                log.warning('Cannot read macros from %s: %s', filename, e)
+
+    def executed(self, commands):
+        """ called with the commands of every utterance once it has run """
+        if len(commands) == 0: return
+        self.last = list(commands)
+        if self.recording is not None:
+            self.recording[1].extend(commands)
+
+    def record(self, name):
+        if self.recording is not None:
+            log.warning('Still recording %s', self.recording[0])
+            return
+        log.info('Recording macro %s', name)
+        self.recording = (name, [])
+
+    def stop(self):
+        if self.recording is None:
+            log.warning('Not recording a macro')
+            return
+        name, commands = self.recording
+        self.recording = None
+        self.macros[name] = commands
+        log.info('Saved macro %s (%d commands)', name, len(commands))
+        self.save()
+
+    def get(self, name):
+        if name not in self.macros:
+            log.warning('No macro named %s', name)
+            return []
+        return self.macros[name]
+
+    def save(self):
+        if self.filename is None: return
+        # write a new file and move it into place, so that a crash
+        # cannot leave a half-written file behind
+        temp = self.filename + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self.macros, f, indent=1, sort_keys=True)
+        if os.name == 'nt' and os.path.exists(self.filename):
+            os.remove(self.filename)  # rename does not replace on windows
+        os.rename(temp, self.filename)
@@ -1,38 +1,185 @@
 # Main file. Parse new commands from stdin until EOF.
 
-from scan import find_keywords
+from scan import set_keywords
+from scan import set_junk
 from scan import scan
-from parse import parse
 from parse import GrammaticalError
 from parse import SingleInputParser
-from execute import execute
+from parse import parse_prefix
+from cache import CommandCache
+from execute import ExecuteCommands, replay
+from automators import CommandBatch
+from reload import Grammar, GrammarReloader
+from plugins import PluginRouter
+from nbest import parse_best
+from context import WindowContext, XDoWindowProvider, FixedWindowProvider
 from ast import printAST
+from latency import LatencyLog
+from usage import UsageLog, mask, error_position
+from macro import Macros
+import parse
+import logs
+
+log = logs.get('main')
+
+def recover(grammar, tokens, error, correct_words, execute_prefix):
+    """ parse tokens, which are not grammatical, again: first with fuzzy
+        correction of unknown words, then keeping only the longest
+        grammatical prefix. Returns (ast, n) for the n tokens used. """
+    if correct_words:
+        try:
+            ast = grammar.corrector.parse(grammar.fast_path.parse, tokens)
+            return (ast, len(tokens))
+        except GrammaticalError:
+            pass
+    # nothing is executed while asleep, not even part of the input
+    if not execute_prefix or grammar.parser.sleeping:
+        raise error
+    return parse_prefix(grammar.parser, tokens)
 
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
-        f = open(filename)
+    import sys, platform, time
+    from options import parse_options
+    from execute import configure
+    options = parse_options()
+    if options.file is not None:
+        f = open(options.file)
     else:
         f = sys.stdin
+    # commands and errors go to stdout, where the tests look for them;
+    # what is shown depends only on the log level
+    logs.setup(options.log_level, options.log_format, sys.stdout)
 
-    parser = SingleInputParser()
-    find_keywords(parser)  # init lexer
+    grammar = Grammar(SingleInputParser(options.start))
+    set_keywords(grammar.keywords)  # init lexer
+    set_junk(options.junk, trailing=options.junk_trailing)
+    if options.batch_window > 0:
+        batch = CommandBatch(options.batch_window / 1000.0,
+            options.batch_max_delay / 1000.0)
+    else:
+        batch = None
+    configure(options.automator, options.keymap, command_batch=batch)
+    reloader = GrammarReloader(parse, 'SingleInputParser',
+        args=(options.start,))
+    router = PluginRouter(grammar, args=(options.start,))
+    cache = CommandCache()
+    real = not options.dry_run
+    if options.latency_log:
+        latency = LatencyLog(open(options.latency_log, 'a'))
+    else:
+        latency = None
+    macros = Macros(options.macros)
+    if options.usage_stats:
+        usage = UsageLog(options.usage_stats)
+    else:
+        usage = None
+    if real and 'Linux' in platform.system():
+        context = WindowContext(XDoWindowProvider())
+    else:
+        context = WindowContext(FixedWindowProvider())
 
     while True:
         line = f.readline()
         if line == '': break
         if line == '\n': continue
+        if latency: latency.start()
+        if usage: started = time.time()
+
+        new_grammar = reloader.poll()
+        if new_grammar is not None:
+            new_grammar.parser.sleeping = grammar.parser.sleeping
+            grammar = new_grammar
+            router = PluginRouter(grammar, args=(options.start,))
+            cache.clear()
+            log.info('Reloaded grammar')
+
+        log.debug('> %s', line.rstrip('\n'))
+        # the recognizer may send its n-best list, separated by tabs
+        hypotheses = line.rstrip('\n').split('\t')
+        # nothing may be reused while asleep: every command is ignored
+        awake = not grammar.parser.sleeping
+        allowed = context.triggers()
+        key = (allowed, tuple([cache.key(h) for h in hypotheses]))
+        commands = None
+        if awake:
+            commands = cache.get(key)
+        # an utterance that produced no commands is a hit as well
+        if commands is not None:
+            replay(commands, real)
+            macros.executed(commands)
+            if latency:
+                latency.mark('replay')
+                latency.finish()
+            if usage:
+                words = key[1][0]
+                usage.record(mask(words, router.select(words, allowed).keywords),
+                    'cache', time.time() - started)
+            continue
 
-        print ">", line,
+        candidates = []
+        # the hypothesis of each candidate
+        sources = []
+        for j, hypothesis in enumerate(hypotheses):
+            for active in router.choices(cache.key(hypothesis), allowed):
+                set_keywords(active.keywords)
+                candidates.append((active, scan(hypothesis)))
+                sources.append(j)
+        if latency: latency.mark('scan')
+        if usage:
+            # before parsing, which changes some tokens
+            words = [[t.type for t in tokens[:-1]] for _, tokens in candidates]
+            result, used, position = 'ok', words[0], None
         try:
-            ast = parse(parser, scan(line))
+            complete = True
+            try:
+                i, ast = parse_best(candidates, options.n_best_budget)
+                active = candidates[i][0]
+                if usage: used = words[i]
+                if sources[i] > 0:
+                    log.info('Using hypothesis %d: %s', sources[i] + 1,
+                        hypotheses[sources[i]])
+            except GrammaticalError as e:
+                active, tokens = candidates[0]
+                ast, n = recover(active, tokens, e,
+                    options.correct, options.prefix)
+                if n < len(tokens):
+                    complete = False
+                    log.warning('Error: %s', e)
+                    # junk words were not scanned, so go by wordno
+                    skip = n > 0 and tokens[n-1].wordno or 0
+                    log.warning('Ignoring: %s',
+                        ' '.join(hypotheses[0].split()[skip:]))
+                    result, position = 'partial', n + 1
+            if latency: latency.mark('parse')
             printAST(ast)
-            execute(ast, f == sys.stdin)
+            if latency: latency.mark('print')
+            executor = ExecuteCommands(ast, real, macros=macros)
+            commands = executor.automator.executed
+            macros.executed(commands)
+            if latency:
+                latency.mark('execute', executor.traversed)
+                latency.mark('keystrokes')
+            if awake and complete and not active.parser.touched_state:
+                cache.put(key, commands)
         except GrammaticalError as e:
-            print "Error:", e
+            log.warning('Error: %s', e)
+            if usage:
+                result = 'error'
+                position = error_position(candidates[0][1], e)
+        if latency: latency.finish()
+        # what is said while asleep is not meant for Silvius
+        if usage and awake:
+            usage.record(used, result, time.time() - started, position)
 
     if f != sys.stdin:
         f.close()
 
+    if batch:
+        batch.flush()
+    # so that the summary comes after everything that was logged
+    logs.flush()
+    print cache
+    if batch: print batch
+    if latency: print latency.summary()
+    if usage: usage.close()
     print 'ok'
@@ -0,0 +1,111 @@
+# Parses the n-best list of recognizer hypotheses, in order, until one of
+# them is grammatical. Hypotheses usually differ only in a word or two,
+# so the Earley sets computed for a common prefix are reused.
+
+import time
+from parse import GrammaticalError
+from parse import parse
+
+def _copy(sets, links, i):
+    """ copy of the parse state before token i. sets[i] and the links
+        into it are still being extended; everything before is final and
+        may be shared. """
+    cur = list(sets[i])
+    links = dict(links)
+    for item in cur:
+        key = (item, i)
+        if key in links:
+            links[key] = list(links[key])
+    return sets[:i] + [cur], links
+
+class SharedPrefixParser:
+    def __init__(self, parser, candidates):
+        """ candidates are the token lists that will be parsed with
+            parser, in order. The state is saved only for the longest
+            prefix each candidate has in common with an earlier one. """
+        self.parser = parser
+        self.saved = {}
+        self.shared = set()
+        seen = set()
+        for tokens in candidates:
+            types = self.types(tokens)
+            for i in range(len(types) - 1, 0, -1):
+                if types[:i] in seen:
+                    self.shared.add(types[:i])
+                    break
+            for i in range(1, len(types)):
+                seen.add(types[:i])
+
+    def types(self, tokens):
+        return tuple([self.parser.typestring(t) for t in tokens])
+
+    def parse(self, tokens):
+        """ same as parse.parse(parser, tokens) """
+        p = self.parser
+        if p.ruleschanged:
+            return parse(p, tokens)
+        p.touched_state = False
+
+        types = self.types(tokens)
+        start = 0
+        for i in range(len(types), 0, -1):
+            if types[:i] in self.saved:
+                start = i
+                break
+        if start:
+            sets, links = self.saved[types[:start]]
+            sets, p.links = _copy(sets, links, start)
+        else:
+            sets, p.links = [ [(1,0), (2,0)] ], {}
+
+        i = len(tokens) - 1
+        for i in xrange(start, len(tokens)):
+            if i > start and types[:i] in self.shared:
+                self.saved[types[:i]] = _copy(sets, p.links, i)
+            sets.append([])
+
+            if sets[i] == []:
+                break
+            p.makeSet(tokens[i], sets, i)
+        else:
+            sets.append([])
+            p.makeSet(None, sets, len(tokens))
+
+        p.sets = sets
+        if p.profile is not None:
+            p.profile.record(p, tokens, sets)
+        finalitem = (p.finalState(tokens), 0)
+        if finalitem not in sets[-2]:
+            if len(tokens) > 0:
+                p.error(tokens[i-1])
+            else:
+                p.error(None)
+
+        return p.buildTree(p._START, finalitem, tokens, len(sets)-2)
+
+def parse_best(candidates, budget=None):
+    """ candidates is a list of (grammar, tokens), best hypothesis first.
+        Return (i, ast) for the first candidate that parses. Once budget
+        seconds have passed no further candidates are tried; if none
+        parsed, the error for the first candidate is raised. """
+    deadline = budget is not None and time.time() + budget
+    by_parser = {}
+    for grammar, tokens in candidates:
+        by_parser.setdefault(grammar.parser, []).append(tokens)
+    shared = {}
+    for parser, lists in by_parser.items():
+        shared[parser] = SharedPrefixParser(parser, lists)
+
+    first_error = None
+    for i, (grammar, tokens) in enumerate(candidates):
+        if i > 0 and deadline and time.time() > deadline:
+            break
+        try:
+            ast = grammar.fast_path.lookup(tokens)
+            if ast is None:
+                ast = shared[grammar.parser].parse(tokens)
+            return (i, ast)
+        except GrammaticalError as e:
+            if first_error is None:
+                first_error = e
+    raise first_error
@@ -0,0 +1,109 @@
+# Command line and config file options for main.py.
+
+import argparse, ConfigParser
+from execute import automators
+from automators import NirCmdAutomator
+import logs
+
+def make_arg_parser():
+    keymaps = sorted(NirCmdAutomator.keymaps['escape'].keys())
+    parser = argparse.ArgumentParser(
+        description='Execute the voice commands read from stdin or a file')
+    parser.add_argument('-c', '--config',
+        help='Read default options from the [main] section of this file')
+    parser.add_argument('-q', '--quiet', action='store_true',
+        help='Do not print tokens, parse trees or commands; the same as '
+             '--log-level warning')
+    parser.add_argument('--log-level', choices=sorted(logs.levels),
+        help='Print messages of this level and above: tokens and parse '
+             'trees are debug, commands info, errors warning '
+             '(default: debug)')
+    parser.add_argument('--log-format', choices=['text', 'json'],
+        default='text', help='Print messages as text or as one JSON '
+             'object per line (default: text)')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+        help='Print commands instead of executing them')
+    parser.add_argument('-a', '--automator', choices=sorted(automators),
+        help='Tool that sends keystrokes (default: the one for this platform)')
+    parser.add_argument('-k', '--keymap', choices=keymaps,
+        help='Keyboard layout for nircmd (default: %s)' % NirCmdAutomator.keymap)
+    parser.add_argument('-s', '--start', default='single_input',
+        help='Start symbol of the grammar (default: single_input)')
+    parser.add_argument('--correct', action='store_true',
+        help='When an utterance does not parse, replace words that are '
+             'close to a keyword and try again')
+    parser.add_argument('--prefix', action='store_true',
+        help='When an utterance does not parse, execute the part of it '
+             'before the error')
+    parser.add_argument('--junk', default='',
+        help='Comma-separated words to drop at the start of an utterance')
+    parser.add_argument('--junk-trailing', action='store_true',
+        help='Also drop junk words at the end of an utterance')
+    parser.add_argument('--n-best-budget', type=float, default=0.1,
+        help='Seconds spent trying alternative hypotheses (default: 0.1)')
+    parser.add_argument('--latency-log',
+        help='Write the time spent in each stage of every utterance to '
+             'this file, and print percentiles on exit')
+    parser.add_argument('--batch-window', type=float, default=0.0,
+        help='Milliseconds to wait for another utterance, so that the '
+             'keystrokes of both are sent at once (default: 0, off)')
+    parser.add_argument('--batch-max-delay', type=float, default=30.0,
+        help='With --batch-window, the longest that keystrokes may be '
+             'held back, in milliseconds (default: 30)')
+    parser.add_argument('--macros',
+        help='Keep named macros in this file, e.g. ~/.silvius-macros.json '
+             '(default: for this session only)')
+    parser.add_argument('--usage-stats',
+        help='Append the keywords, result and latency of every utterance '
+             'said while awake to this file, for usage.py; dictated words '
+             'are stored as ANY, but spelled-out text letter by letter')
+    parser.add_argument('file', nargs='?',
+        help='Read utterances from this file instead of stdin; '
+             'implies --dry-run')
+    return parser
+
+def read_config(parser, filename):
+    """ defaults for parser's options from the [main] section of an ini
+        file. Keys are long option names, e.g. "dry-run = yes". """
+    defaults = vars(parser.parse_args([]))
+    config = ConfigParser.RawConfigParser()
+    if not config.read(filename):
+        parser.error("cannot read config file `%s'" % filename)
+    if not config.has_section('main'):
+        return {}
+
+    values = {}
+    for option, value in config.items('main'):
+        dest = option.replace('-', '_')
+        if dest not in defaults or dest in ('config', 'file'):
+            parser.error("unknown option `%s' in %s" % (option, filename))
+        elif isinstance(defaults[dest], bool):
+            value = config.getboolean('main', option)
+        elif isinstance(defaults[dest], float):
+            value = config.getfloat('main', option)
+        values[dest] = value
+    return values
+
+def parse_options(argv=None):
+    parser = make_arg_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        # options on the command line override the config file
+        parser.set_defaults(**read_config(parser, args.config))
+        args = parser.parse_args(argv)
+    # values from the config file are not checked by argparse
+    if args.automator is not None and args.automator not in automators:
+        parser.error("unknown automator `%s'" % args.automator)
+    if args.keymap is not None and \
+            args.keymap not in NirCmdAutomator.keymaps['escape']:
+        parser.error("unknown keymap `%s'" % args.keymap)
+    if args.log_level is None:
+        args.log_level = args.quiet and 'warning' or 'debug'
+    elif args.log_level not in logs.levels:
+        parser.error("unknown log level `%s'" % args.log_level)
+    if args.log_format not in ('text', 'json'):
+        parser.error("unknown log format `%s'" % args.log_format)
+    if args.file is not None:
+        args.dry_run = True
+    args.junk = [w for w in args.junk.lower().split(',') if w]
+    return args
@@ -3,23 +3,42 @@
 from spark import GenericParser
 from spark import GenericASTBuilder
 from ast import AST
+import logs
+
+log = logs.get('parse')
 
 class GrammaticalError(Exception):
-    def __init__(self, string):
+    def __init__(self, string, token=None):
         self.string = string
+        self.token = token
     def __str__(self):
         return self.string
 
 class CoreParser(GenericParser):
+    # nonterminals whose p_ function changes parser state, so their
+    # results may never be reused without running the parser
+    stateful_rules = ()
+
     def __init__(self, start):
         GenericParser.__init__(self, start)
+        self.touched_state = False
+        for rule in self.rule2func:
+            if self.rule2name[rule] in self.stateful_rules:
+                self.rule2func[rule] = self.mark_stateful(self.rule2func[rule])
+
+    def mark_stateful(self, func):
+        def wrapper(args):
+            self.touched_state = True
+            return func(args)
+        return wrapper
 
     def typestring(self, token):
         return token.type
 
     def error(self, token):
         raise GrammaticalError(
-            "Unexpected token `%s' (word number %d)" % (token, token.wordno))
+            "Unexpected token `%s' (word number %d)" % (token, token.wordno),
+            token)
 
     def p_chained_commands(self, args):
         '''
@@ -349,9 +368,9 @@ class CoreParser(GenericParser):
 
     def p_english(self, args):
         '''
-            english ::= word ANY
+            english ::= word raw_word
         '''
-        return AST('sequence', [ args[1].extra ])
+        return AST('sequence', [ args[1] ])
 
     def p_word_sentence(self, args):
         '''
@@ -394,19 +413,25 @@ class CoreParser(GenericParser):
             raw_word ::= nine
             raw_word ::= to
             raw_word ::= for
+            raw_word ::= macro
+            raw_word ::= record
+            raw_word ::= stop
+            raw_word ::= play
+            raw_word ::= again
         '''
         if(args[0].type == 'ANY'):
             return args[0].extra
         return args[0].type
 
 class SingleInputParser(CoreParser):
-    def __init__(self):
-        # if you have the issue that commands fail because spurious
-        # tokens ('i', 'the',...) are prepended to the acual command,
-        # try commenting the 'single_input' line, and uncommenting
-        # the 'single_input_discard_junk' line.
-        CoreParser.__init__(self, 'single_input')
-        #CoreParser.__init__(self, 'single_input_discard_junk')
+    # the commands of macro_commands depend on earlier utterances
+    stateful_rules = ('sleep_commands', 'macro_commands')
+
+    def __init__(self, start='single_input'):
+        # if commands fail because spurious tokens ('i', 'the',...) are
+        # prepended to the actual command, drop them in the scanner
+        # with scan.set_junk.
+        CoreParser.__init__(self, start)
         self.sleeping = False
 
     def p_sleep_commands(self, args):
@@ -416,47 +441,49 @@ class SingleInputParser(CoreParser):
         '''
         if args[-1].type == 'sleep':
             self.sleeping = True
-            print 'Going to sleep.'
+            log.info('Going to sleep.')
         else:
             self.sleeping = False
-            print 'Waking from sleep'
+            log.info('Waking from sleep')
         return AST('')
 
+    def p_macro_commands(self, args):
+        '''
+            macro_commands ::= macro record ANY
+            macro_commands ::= macro stop
+            macro_commands ::= macro play ANY
+            macro_commands ::= again repeat
+        '''
+        if args[0].type == 'again':
+            return AST('again', [ args[1] or 1 ])
+        return AST('macro', [ args[1].type ] + [ a.extra for a in args[2:] ])
+
     def p_single_input(self, args):
         '''
             single_input ::= END
             single_input ::= sleep_commands END
+            single_input ::= macro_commands END
             single_input ::= chained_commands END
         '''
-        if len(args) > 0 and not self.sleeping:
-            return args[0]
-        else:
-            return AST('')
-
-    def p_single_input_discard_junk(self, args):
-        '''
-            single_input_discard_junk ::= END
-            single_input_discard_junk ::= junk_tokens sleep_commands END
-            single_input_discard_junk ::= junk_tokens chained_commands END
-        '''
         if len(args) > 1 and not self.sleeping:
-            return args[1]
+            return args[0]
         else:
             return AST('')
 
-    # With some models, Kaldi may return spurious tokens in response
-    # to noise. If that happens just before we say a command, it will
-    # make the command fail. This "dummy" rule will swallows these tokens.
-    def p_junk_tokens(self, args):
-        '''
-            junk_tokens ::=
-            junk_tokens ::= i junk_tokens
-            junk_tokens ::= the junk_tokens
-            junk_tokens ::= a junk_tokens
-            junk_tokens ::= and junk_tokens
-        '''
-        return AST('')
-
 
 def parse(parser, tokens):
+    parser.touched_state = False
     return parser.parse(tokens)
+
+def parse_prefix(parser, tokens):
+    """ (ast, n) where n is the number of tokens used. If tokens are not
+        grammatical, the ast is for the longest prefix tokens[:n] that
+        forms chained_commands, so that part can still be executed.
+        Raises GrammaticalError if there is no such prefix. """
+    try:
+        return (parse(parser, tokens), len(tokens))
+    except GrammaticalError:
+        found = parser.longestPrefix(tokens, 'chained_commands')
+        if found is None:
+            raise
+        return found
@@ -0,0 +1,73 @@
+# Grammar plugins: groups of commands that start with a trigger word, such
+# as "shell list". Each plugin is a parser class that extends the core
+# grammar; it is only imported and compiled the first time its trigger
+# word is spoken, so utterances without a trigger word are parsed by the
+# smaller core grammar.
+
+import importlib, types
+from ast import AST
+from reload import Grammar
+
+# trigger word -> (module name, parser class name)
+registry = {}
+
+def register(trigger, module, class_name):
+    registry[trigger] = (module, class_name)
+
+register('shell', 'plugins.shell', 'ShellParser')
+register('git', 'plugins.git', 'GitParser')
+
+def typed(text):
+    """ AST that types text; spaces in text are typed as well """
+    return AST('word_sequence', None,
+        [ AST('null', word) for word in text.split(' ') ])
+
+class PluginRouter:
+    """ picks the grammar to parse an utterance with: the core grammar, or
+        a grammar combining the plugins whose trigger words it contains.
+        Plugin grammars are built when first needed, and kept. """
+
+    def __init__(self, core, args=()):
+        """ plugin parsers are made by calling their class with args """
+        self.core = core
+        self.args = args
+        self.loaded = {}
+
+    def select(self, words, allowed=None):
+        """ allowed, if given, limits the plugins that may be used """
+        # only the core grammar knows how to wake up
+        if self.core.parser.sleeping: return self.core
+
+        triggers = frozenset([w for w in words if w in registry])
+        if allowed is not None:
+            triggers &= allowed
+        if len(triggers) == 0: return self.core
+        if triggers not in self.loaded:
+            self.loaded[triggers] = self.load(triggers)
+        return self.loaded[triggers]
+
+    def choices(self, words, allowed=None):
+        """ the grammars to try, in order: the one select() picks, then
+            the core grammar, since a trigger word may also be dictated
+            ("word shell") """
+        grammar = self.select(words, allowed)
+        if grammar is self.core:
+            return [grammar]
+        return [grammar, self.core]
+
+    def load(self, triggers):
+        """ a grammar with the rules of the plugins for triggers added to
+            the core parser's class. The plugin classes derive from the
+            SingleInputParser they imported, which is not the one main.py
+            uses after parse.py was reloaded, so only the methods they
+            define themselves are taken from them. """
+        methods = {}
+        for trigger in sorted(triggers):
+            (module, class_name) = registry[trigger]
+            plugin = getattr(importlib.import_module(module), class_name)
+            for name, value in plugin.__dict__.items():
+                if name not in ('__module__', '__doc__'):
+                    methods[name] = value
+        parser_class = types.ClassType('_'.join(sorted(triggers)),
+            (self.core.parser.__class__,), methods)
+        return Grammar(parser_class(*self.args), triggers)
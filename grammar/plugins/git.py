@@ -0,0 +1,25 @@
+# Git commands, e.g. "git status slap".
+
+from parse import SingleInputParser
+from plugins import typed
+
+class GitParser(SingleInputParser):
+    def p_single_command_git(self, args):
+        '''
+            single_command ::= git_command
+        '''
+        return args[0]
+
+    def p_git_command(self, args):
+        '''
+            git_command ::= git status
+            git_command ::= git diff
+            git_command ::= git add
+            git_command ::= git commit
+            git_command ::= git log
+            git_command ::= git push
+            git_command ::= git pull
+            git_command ::= git checkout
+            git_command ::= git branch
+        '''
+        return typed('git %s ' % args[1].type)
@@ -0,0 +1,36 @@
+# Bash commands, e.g. "shell change dot dot slap" types `cd ..` + Return.
+
+from parse import SingleInputParser
+from plugins import typed
+
+class ShellParser(SingleInputParser):
+    def p_single_command_shell(self, args):
+        '''
+            single_command ::= shell_command
+        '''
+        return args[0]
+
+    def p_shell_command(self, args):
+        '''
+            shell_command ::= shell list
+            shell_command ::= shell change
+            shell_command ::= shell copy
+            shell_command ::= shell move
+            shell_command ::= shell remove
+            shell_command ::= shell make directory
+            shell_command ::= shell grep
+            shell_command ::= shell less
+            shell_command ::= shell echo
+        '''
+        value = {
+            'list'  : 'ls -la ',
+            'change': 'cd ',
+            'copy'  : 'cp ',
+            'move'  : 'mv ',
+            'remove': 'rm ',
+            'make'  : 'mkdir -p ',
+            'grep'  : 'grep ',
+            'less'  : 'less ',
+            'echo'  : 'echo ',
+        }
+        return typed(value[args[1].type])
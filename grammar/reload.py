@@ -0,0 +1,85 @@
+# Recompile the grammar in the background when its source file changes.
+
+import imp, os, threading, time
+from lm import get_terminals
+from fastpath import FastPath
+from fuzzy import Corrector
+from scan import Token
+import logs
+
+log = logs.get('reload')
+
+class Grammar:
+    """ a parser together with the tables derived from it """
+
+    def __init__(self, parser, triggers=()):
+        self.parser = parser
+        self.keywords = get_terminals(parser)
+        self.fast_path = FastPath(parser, required=triggers)
+        self.corrector = Corrector(self.keywords)
+
+    def warm_up(self):
+        """ do the work that the first utterance would otherwise wait
+            for: list the fast path's sentences, and parse once, which
+            makes the parser build its tables """
+        self.fast_path.find_sentences()
+        self.parser.parse([Token('END')])
+
+class GrammarReloader:
+    """ watches the file that defines a parser class. When it changes, the
+        file is loaded into a fresh module and a new Grammar is built from
+        it in a background thread; the old module and parser are not
+        touched, so they can keep running until poll() hands over the new
+        grammar. """
+
+    def __init__(self, module, class_name, interval=1.0, args=()):
+        """ the parser is made by calling the class with args """
+        self.module = module
+        self.class_name = class_name
+        self.args = args
+        self.interval = interval
+        self.path = os.path.splitext(module.__file__)[0] + '.py'
+        self.mtime = os.stat(self.path).st_mtime
+        self.pending = None
+        self.lock = threading.Lock()
+
+        thread = threading.Thread(target=self.watch)
+        thread.daemon = True
+        thread.start()
+
+    def watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                continue  # editors may briefly remove the file
+            if mtime == self.mtime: continue
+            self.mtime = mtime
+
+            try:
+                grammar = self.load()
+            except Exception as e:
+                log.error("Could not reload %s: %s", self.path, e)
+                continue
+            with self.lock:
+                self.pending = grammar
+
+    def load(self):
+        module = imp.new_module(self.module.__name__)
+        module.__file__ = self.path
+        execfile(self.path, module.__dict__)
+        # keep raising the class that callers already catch
+        if hasattr(self.module, 'GrammaticalError'):
+            module.GrammaticalError = self.module.GrammaticalError
+        grammar = Grammar(getattr(module, self.class_name)(*self.args))
+        # python clears a module's globals when the module object goes away
+        grammar.module = module
+        grammar.warm_up()
+        return grammar
+
+    def poll(self):
+        """ return the grammar compiled since the last call, or None """
+        with self.lock:
+            grammar, self.pending = self.pending, None
+        return grammar
@@ -2,10 +2,43 @@
 
 import re
 from lm import get_terminals
+import logs
+
+log = logs.get('scan')
 
 def find_keywords(parser):
+    set_keywords(get_terminals(parser))
+
+def set_keywords(words):
     global keywords
-    keywords = get_terminals(parser)
+    keywords = frozenset(words)
+
+# With some models, Kaldi may return spurious tokens in response to
+# noise. If that happens just before we say a command, it will make the
+# command fail, so these words are dropped before the parser sees them.
+junk = frozenset()
+junk_leading = True
+junk_trailing = False
+
+def set_junk(words, leading=True, trailing=False):
+    """ drop words found in words at the start (leading) and/or end
+        (trailing) of each line. Dropping them here instead of in the
+        grammar keeps the grammar unambiguous. """
+    global junk, junk_leading, junk_trailing
+    junk = frozenset(words)
+    junk_leading = leading
+    junk_trailing = trailing
+
+def strip_junk(words):
+    """ (start, end) such that words[start:end] is words without junk """
+    start, end = 0, len(words)
+    if junk_leading:
+        while start < end and words[start] in junk:
+            start += 1
+    if junk_trailing:
+        while end > start and words[end-1] in junk:
+            end -= 1
+    return (start, end)
 
 class Token:
     def __init__(self, type, wordno=-1, extra=''):
@@ -18,15 +51,18 @@ class Token:
     def __repr__(self):
         return str(self.type)
 
-def scan(line):
+def scan(line, verbose=True):
     tokens = []
-    wordno = 0
-    for t in line.lower().split():
+    words = line.lower().split()
+    start, end = strip_junk(words)
+    wordno = start
+    for t in words[start:end]:
         wordno += 1
         if(t in keywords):
             tokens.append(Token(t, wordno))
         else:
             tokens.append(Token('ANY', wordno, t))
     tokens.append(Token('END'))
-    print tokens
+    if verbose:
+        log.debug('%s', tokens)
     return tokens
@@ -98,6 +98,53 @@ class _State:
 		self.T, self.complete, self.items = [], [], items
 		self.stateno = stateno
 
+class _Profile:
+	#
+	#  Counters for GenericParser.enableProfile().  Everything is
+	#  derived from the Earley sets after each parse, so the parser
+	#  itself runs unchanged.
+	#
+	def __init__(self):
+		self.parses = 0
+		self.last = None
+		self.totals = {}
+		self.predicted = {}
+		self.completed = {}
+
+	def count(self, counter, parser, rule):
+		name = parser.ruleName(rule)
+		counter[name] = counter.get(name, 0) + 1
+
+	def record(self, parser, tokens, sets):
+		predictors = {}
+		for (state, sym), k in parser.edges.items():
+			if sym is None and k is not None:
+				predictors[k] = 1
+
+		stats = { 'tokens': len(tokens), 'sets': len(sets),
+			  'items': 0, 'max_set': 0, 'links': len(parser.links),
+			  'predictions': 0, 'completions': 0 }
+		for i in range(len(sets)):
+			stats['items'] = stats['items'] + len(sets[i])
+			stats['max_set'] = max(stats['max_set'], len(sets[i]))
+			for state, parent in sets[i]:
+				if parent == i and predictors.has_key(state):
+					for rule, pos in parser.states[state].items:
+						self.count(self.predicted, parser, rule)
+						stats['predictions'] = stats['predictions'] + 1
+				elif parent != i:
+					for rule in parser.states[state].complete:
+						self.count(self.completed, parser, rule)
+						stats['completions'] = stats['completions'] + 1
+
+		self.parses = self.parses + 1
+		self.last = stats
+		for k, v in stats.items():
+			if k != 'max_set':
+				self.totals[k] = self.totals.get(k, 0) + v
+		self.totals['max_set'] = max(self.totals.get('max_set', 0),
+					     stats['max_set'])
+
 class GenericParser:
 	#
 	#  An Earley parser, as per J. Earley, "An Efficient Context-Free
@@ -122,6 +169,52 @@ class GenericParser:
 	_START = 'START'
 	_BOF = '|-'
 
+	profile = None
+
+	#
+	#  Opt-in statistics on the work done by parse(): the size of
+	#  the Earley sets, and how often each rule was predicted and
+	#  completed.  profileStats() returns plain dicts and lists,
+	#  ready for the json module.
+	#
+	def enableProfile(self):
+		self.profile = _Profile()
+
+	def disableProfile(self):
+		self.profile = None
+
+	def ruleName(self, rule):
+		#
+		#  Name of the p_ function of a rule in self.newrules.
+		#
+		rule = self.new2old.get(rule, rule)
+		if rule[0] == self._START:
+			return self._START
+		return self.rule2name[rule]
+
+	def profileStats(self):
+		p = self.profile
+		machine = { 'states': 0, 'edges': 0, 'rules': 0 }
+		if not self.ruleschanged:
+			machine['states'] = len(self.states)
+			machine['edges'] = len(self.edges)
+			for rules in self.newrules.values():
+				machine['rules'] = machine['rules'] + len(rules)
+		names = {}
+		for counter in p.predicted, p.completed:
+			for name in counter.keys():
+				names[name] = 1
+		rules = []
+		for name in names.keys():
+			rules.append({ 'name': name,
+				       'predicted': p.predicted.get(name, 0),
+				       'completed': p.completed.get(name, 0) })
+		rules.sort(lambda a, b: cmp(b['predicted'] + b['completed'],
+					    a['predicted'] + a['completed']))
+		return { 'parses': p.parses, 'last': p.last,
+			 'totals': p.totals, 'machine': machine,
+			 'rules': rules }
+
 	#
 	#  When pickling, take the time to generate the full state machine;
 	#  some information is then extraneous, too.  Unfortunately we
@@ -332,6 +425,9 @@ class GenericParser:
 			self.makeSet(None, sets, len(tokens))
 
 		#_dump(tokens, sets, self.states)
+		self.sets = sets
+		if self.profile is not None:
+			self.profile.record(self, tokens, sets)
 
 		finalitem = (self.finalState(tokens), 0)
 		if finalitem not in sets[-2]:
@@ -343,6 +439,25 @@ class GenericParser:
 		return self.buildTree(self._START, finalitem,
 				      tokens, len(sets)-2)
 
+	def longestPrefix(self, tokens, nt):
+		#
+		#  For use after parse(tokens) failed: the Earley sets of
+		#  that parse also show where an nt starting at the first
+		#  token was completed.  Return (tree, k) for the longest
+		#  prefix tokens[:k] derived from nt, or None.
+		#
+		sets = self.sets
+		for k in xrange(len(sets)-1, 0, -1):
+			for item in sets[k]:
+				state, parent = item
+				if parent != 0:
+					continue
+				for rule in self.states[state].complete:
+					if rule[0] == nt:
+						return self.buildTree(nt, item,
+								      tokens, k), k
+		return None
+
 	def isnullable(self, sym):
 		#
 		#  For symbols in G_e only.  If we weren't supporting 1.5,
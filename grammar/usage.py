@@ -0,0 +1,193 @@
+# Opt-in record of what is said, to find out which commands, letters
+# and modifiers are used most. main.py --usage-stats FILE appends one
+# line per utterance said while awake: its keywords (other words, i.e.
+# dictated text, are stored as ANY, but spelled-out text is kept letter
+# by letter), whether it worked, and how long it took. The rules
+# behind the keywords are only worked out when a report is made.
+#
+# python usage.py [--top 20] FILE
+
+import json, os, time
+from latency import percentile
+
+def mask(words, keywords):
+    """ words, with those that are not in keywords replaced by ANY """
+    return [w in keywords and w or 'ANY' for w in words]
+
+def error_position(tokens, error):
+    """ the position in tokens, counting from 1, of the token that
+        caused error, a GrammaticalError """
+    for i in range(len(tokens)):
+        if tokens[i] is error.token:
+            return i + 1
+    return None
+
+class UsageLog:
+    """ appends utterances to filename, one JSON object per line. Once
+        the file is larger than max_bytes it becomes filename.1 (and
+        filename.1 becomes filename.2, up to backups) and a new file is
+        started, so the log never takes more than about
+        (backups + 1) * max_bytes. """
+
+    def __init__(self, filename, max_bytes=1 << 20, backups=2):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.f = open(filename, 'a')
+
+    def record(self, words, result, seconds, position=None):
+        """ words are the token types of the utterance. result is ok,
+            cache (replayed from the command cache), partial (only a
+            prefix was executed) or error; position is where in words,
+            counting from 1, the token that failed is, if any. It is not
+            a word number of the utterance, since junk words were
+            dropped before the tokens were made. """
+        entry = {'t': round(time.time(), 3), 'w': words, 'r': result,
+            'ms': round(seconds * 1000, 2)}
+        if position is not None:
+            entry['e'] = position
+        self.f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        if self.f.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.f.close()
+        for i in range(self.backups - 1, 0, -1):
+            old = '%s.%d' % (self.filename, i)
+            if os.path.exists(old):
+                os.rename(old, '%s.%d' % (self.filename, i + 1))
+        if self.backups > 0:
+            os.rename(self.filename, self.filename + '.1')
+        else:
+            os.remove(self.filename)
+        self.f = open(self.filename, 'a')
+
+    def close(self):
+        self.f.close()
+
+def read_usage(filename):
+    """ the records of filename and its rotated files, oldest first """
+    names = [filename]
+    i = 1
+    while os.path.exists('%s.%d' % (filename, i)):
+        names.insert(0, '%s.%d' % (filename, i))
+        i += 1
+    records = []
+    for name in names:
+        if not os.path.exists(name): continue
+        records += [json.loads(line) for line in open(name) if line.strip()]
+    return records
+
+def record_rules(parser, used):
+    """ make parser append to used the name (from rule2name) of the p_
+        function of every rule it applies """
+    def recording(func, name):
+        def wrapper(args):
+            used.append(name)
+            return func(args)
+        return wrapper
+    for rule in parser.rule2func:
+        # the rule for START is applied in every parse
+        if rule[0] == parser._START: continue
+        parser.rule2func[rule] = recording(parser.rule2func[rule],
+            parser.ruleName(rule))
+
+def rule_usage(records, router):
+    """ (counts, failed): how often each rule was used by the utterances
+        in records that worked, parsing each distinct one once with the
+        grammar the router picks for it; and how many no longer parse """
+    from scan import Token
+    from parse import GrammaticalError, parse
+    sequences = {}
+    for r in records:
+        if r['r'] in ('ok', 'cache'):
+            key = tuple(r['w'])
+            sequences[key] = sequences.get(key, 0) + 1
+
+    counts = {}
+    used = []
+    recorded = set()
+    failed = 0
+    for words, n in sequences.items():
+        grammar = router.select(words)
+        if grammar.parser not in recorded:
+            record_rules(grammar.parser, used)
+            recorded.add(grammar.parser)
+        tokens = [Token(w, i + 1, w == 'ANY' and 'word' or '')
+            for i, w in enumerate(words)]
+        tokens.append(Token('END'))
+        del used[:]
+        try:
+            parse(grammar.parser, tokens)
+        except GrammaticalError:
+            failed += n
+            continue
+        finally:
+            # every sequence is parsed as if it were said while awake
+            router.core.parser.sleeping = False
+        for name in used:
+            counts[name] = counts.get(name, 0) + n
+    return counts, failed
+
+def report(records, router, top=20):
+    """ lines of a report on the usage in records """
+    def table(title, counts):
+        total = sum(counts.values())
+        lines = ['', title]
+        ranked = sorted(counts.items(), key=lambda c: (-c[1], c[0]))
+        for name, n in ranked[:top]:
+            lines.append('    %-30s %7d %5.1f%%' % (name, n,
+                100.0 * n / max(total, 1)))
+        return lines
+
+    results = {}
+    words = {}
+    failures = {}
+    latency = {}
+    for r in records:
+        results[r['r']] = results.get(r['r'], 0) + 1
+        for w in r['w']:
+            words[w] = words.get(w, 0) + 1
+        if r['r'] in ('error', 'partial'):
+            # the words up to and including the one that failed
+            key = ' '.join(r['w'][:r.get('e', len(r['w']))])
+            failures[key] = failures.get(key, 0) + 1
+        elif r['w']:
+            latency.setdefault(r['w'][0], []).append(r['ms'])
+
+    lines = ['%d utterances: %s' % (len(records), ', '.join(['%s %d'
+        % (k, results[k]) for k in sorted(results)]))]
+    counts, failed = rule_usage(records, router)
+    lines += table('rules', counts)
+    if failed:
+        lines.append('    (%d utterances no longer parse)' % failed)
+    lines += table('words', words)
+    lines += table('failures, up to the word that failed', failures)
+
+    lines += ['', 'latency by first word (ms)',
+        '    %-20s %7s %8s %8s' % ('word', 'n', 'p50', 'p90')]
+    ranked = sorted(latency.items(), key=lambda l: -len(l[1]))
+    for word, values in ranked[:top]:
+        lines.append('    %-20s %7d %8.2f %8.2f' % (word, len(values),
+            percentile(values, 50), percentile(values, 90)))
+    return lines
+
+if __name__ == '__main__':
+    import argparse
+    from parse import SingleInputParser
+    from reload import Grammar
+    from plugins import PluginRouter
+    arg_parser = argparse.ArgumentParser(
+        description='Report on a log written by main.py --usage-stats')
+    arg_parser.add_argument('--top', type=int, default=20,
+        help='Show this many entries per table (default: 20)')
+    arg_parser.add_argument('-s', '--start', default='single_input',
+        help='Start symbol of the grammar (default: single_input)')
+    arg_parser.add_argument('log', help='Usage log; rotated files '
+        '(log.1, log.2, ...) are read as well')
+    args = arg_parser.parse_args()
+
+    router = PluginRouter(Grammar(SingleInputParser(args.start)),
+        args=(args.start,))
+    for line in report(read_usage(args.log), router, args.top):
+        print line
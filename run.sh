@@ -21,7 +21,7 @@ function check_microphone {
 
 function run_recognition {
     if [[ $1 == 1 ]]; then
-        python stream/mic.py -s silvius-server.voxhub.io -d $which $args | python grammar/main.py
+        python stream/mic.py -s silvius-server.voxhub.io -d $which -n 5 $args | python grammar/main.py
     else
         python stream/mic.py -s silvius-server.voxhub.io -d $which $args
     fi
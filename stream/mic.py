@@ -4,9 +4,16 @@ __author__ = 'dwk'
 import argparse
 from ws4py.client.threadedclient import WebSocketClient
 import threading
+import os
 import sys
 import urllib
 import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'grammar'))
+import logs
+
+log = logs.get('mic')
 
 reconnect_mode = False
 fatal_error = False
@@ -15,20 +22,65 @@ class MyClient(WebSocketClient):
 
     def __init__(self, url, mic=1, protocols=None, extensions=None, heartbeat_freq=None, byterate=16000,
                  show_hypotheses=True,
-                 save_adaptation_state_filename=None, send_adaptation_state_filename=None, audio_gate=0):
+                 save_adaptation_state_filename=None, send_adaptation_state_filename=None, audio_gate=0,
+                 n_best=1, latency_log=None, record=None, redraw=False):
         super(MyClient, self).__init__(url, protocols, extensions, heartbeat_freq)
         self.mic = mic
         self.show_hypotheses = show_hypotheses
+        # show partial results on one line of the terminal instead of
+        # logging each of them
+        self.redraw = redraw
+        self.drawn = 0
         self.byterate = byterate
         self.save_adaptation_state_filename = save_adaptation_state_filename
         self.send_adaptation_state_filename = send_adaptation_state_filename
         self.chunk = 0
         self.audio_gate = audio_gate
+        self.n_best = n_best
+        self.latency_log = latency_log
+        self.record = record
+        self.opened_at = None
+        self.stream_start = None
+        self.first_partial = None
+        self.utterance = 0
 
     def send_data(self, data):
+        if self.stream_start is None:
+            self.stream_start = time.time()
         self.send(data, binary=True)
 
+    def draw_partial(self, trans):
+        text = trans.replace("\n", "\\n")
+        if len(text) > 80:
+            text = "... %s" % text[-76:]
+        sys.stderr.write('\r%s' % text.ljust(self.drawn))
+        sys.stderr.flush()
+        self.drawn = len(text)
+
+    def clear_partial(self):
+        if self.drawn > 0:
+            sys.stderr.write('\r%s\r' % (' ' * self.drawn))
+            sys.stderr.flush()
+            self.drawn = 0
+
+    def log_latency(self, response, final):
+        """ write the times of a final result to the latency log, as
+            JSON. The server gives the end of the utterance in seconds
+            of audio since the stream started. """
+        self.utterance += 1
+        record = {'utterance': self.utterance, 'final': final,
+            'first_partial': self.first_partial}
+        if 'segment-start' in response and 'segment-length' in response \
+                and self.stream_start is not None:
+            record['audio_end'] = self.stream_start \
+                + response['segment-start'] + response['segment-length']
+            record['decode'] = final - record['audio_end']
+        self.latency_log.write(json.dumps(record, sort_keys=True) + '\n')
+        self.latency_log.flush()
+        self.first_partial = None
+
     def opened(self):
+        self.opened_at = time.time()
         import pyaudio
         import audioop
         pa = pyaudio.PyAudio()
@@ -43,8 +95,8 @@ class MyClient(WebSocketClient):
                 mic = self.mic
                 if mic == -1:
                     mic = pa.get_default_input_device_info()['index']
-                    print >> sys.stderr, "Selecting default mic"
-                print >> sys.stderr, "Using mic #", mic
+                    log.info("Selecting default mic")
+                log.info("Using mic # %s", mic)
                 stream = pa.open(
                     rate = sample_rate,
                     format = pyaudio.paInt16,
@@ -58,15 +110,15 @@ class MyClient(WebSocketClient):
                     if(sample_rate != new_sample_rate):
                         sample_rate = new_sample_rate
                         continue
-                print >> sys.stderr, "\n", e
-                print >> sys.stderr, "\nCould not open microphone. Please try a different device."
+                log.error("%s", e)
+                log.error("Could not open microphone. Please try a different device.")
                 global fatal_error
                 fatal_error = True
                 sys.exit(0)
      
         def mic_to_ws():  # uses stream
             try:
-                print >> sys.stderr, "\nLISTENING TO MICROPHONE"
+                log.info("LISTENING TO MICROPHONE")
                 last_state = None
                 while True:
                     data = stream.read(self.chunk)
@@ -82,7 +134,7 @@ class MyClient(WebSocketClient):
                     self.send_data(data)
             except IOError, e:
                 # usually a broken pipe
-                print e
+                log.error("%s", e)
             except AttributeError:
                 # currently raised when the socket gets closed by main thread
                 pass
@@ -101,35 +153,49 @@ class MyClient(WebSocketClient):
 
     def received_message(self, m):
         response = json.loads(str(m))
+        if self.record:
+            # for replay-server.py
+            record = {'t': time.time() - self.opened_at, 'response': response}
+            self.record.write(json.dumps(record) + '\n')
+            self.record.flush()
         #print >> sys.stderr, "RESPONSE:", response
         #print >> sys.stderr, "JSON was:", m
         if response['status'] == 0:
             if 'result' in response:
+                now = time.time()
                 trans = response['result']['hypotheses'][0]['transcript']
                 if response['result']['final']:
                     if self.show_hypotheses:
-                        print >> sys.stderr, '\r%s' % trans.replace("\n", "\\n")
-                    print '%s' % trans.replace("\n", "\\n")  # final result!
+                        self.clear_partial()
+                        log.info('%s', trans)
+                    # final result! alternatives follow, separated by tabs
+                    hypotheses = response['result']['hypotheses'][:self.n_best]
+                    print '\t'.join([h['transcript'].replace("\n", "\\n").replace("\t", " ")
+                        for h in hypotheses])
                     sys.stdout.flush()
-                elif self.show_hypotheses:
-                    print_trans = trans.replace("\n", "\\n")
-                    if len(print_trans) > 80:
-                        print_trans = "... %s" % print_trans[-76:]
-                    print >> sys.stderr, '\r%s' % print_trans,
+                    if self.latency_log:
+                        self.log_latency(response, now)
+                else:
+                    if self.first_partial is None:
+                        self.first_partial = now
+                    if self.show_hypotheses:
+                        if self.redraw:
+                            self.draw_partial(trans)
+                        else:
+                            log.debug('... %s', trans)
             if 'adaptation_state' in response:
                 if self.save_adaptation_state_filename:
-                    print >> sys.stderr, "Saving adaptation state to %s" % self.save_adaptation_state_filename
+                    log.info("Saving adaptation state to %s", self.save_adaptation_state_filename)
                     with open(self.save_adaptation_state_filename, "w") as f:
                         f.write(json.dumps(response['adaptation_state']))
         else:
-            print >> sys.stderr, "Received error from server (status %d)" % response['status']
+            log.error("Received error from server (status %d)", response['status'])
             if 'message' in response:
-                print >> sys.stderr, "Error message:",  response['message']
+                log.error("Error message: %s", response['message'])
             
             global reconnect_mode
             if reconnect_mode:
-                import time
-                print >> sys.stderr, "Sleeping for five seconds before reconnecting"
+                log.info("Sleeping for five seconds before reconnecting")
                 time.sleep(5)
 
 
@@ -154,27 +220,41 @@ def setup():
     parser.add_argument('--content-type', default=content_type, help="Use the specified content type (default is " + content_type + ")")
     parser.add_argument('--hypotheses', default=True, type=int, help="Show partial recognition hypotheses (default: 1)")
     parser.add_argument('-g', '--audio-gate', default=0, type=int, help="Audio-gate level to reduce detections when not talking")
+    parser.add_argument('-n', '--n-best', default=1, type=int, help="Print up to this many alternative hypotheses, separated by tabs (default: 1)")
+    parser.add_argument('--latency-log', help="Append the arrival time of every final result to this file, for grammar/latency.py")
+    parser.add_argument('--record', help="Record the server's responses on the (last) connection to this file, for replay-server.py")
+    parser.add_argument('--log-level', default='info', choices=sorted(logs.levels), help="Print messages of this level and above on stderr: final results are info; partial results are debug, and are otherwise redrawn on one line of a terminal (default: info)")
+    parser.add_argument('--log-format', default='text', choices=['text', 'json'], help="Print messages as text or as one JSON object per line (default: text)")
     args = parser.parse_args()
+    logs.setup(args.log_level, args.log_format, sys.stderr)
 
     content_type = args.content_type
-    print >> sys.stderr, "Content-Type:", content_type
+    log.info("Content-Type: %s", content_type)
 
     if(args.keep_going):
         global reconnect_mode
         global fatal_error
         reconnect_mode = True
         while(fatal_error == False):
-            print >> sys.stderr, "Reconnecting..."
+            log.info("Reconnecting...")
             run(args, content_type, path)
     else:
         run(args, content_type, path)
 
 def run(args, content_type, path):
+    latency_log = None
+    if args.latency_log:
+        latency_log = open(args.latency_log, 'a')
+    record = None
+    if args.record:
+        record = open(args.record, 'w')
     uri = "ws://%s:%s/%s?%s" % (args.server, args.port, path, urllib.urlencode([("content-type", content_type)]))
-    print >> sys.stderr, "Connecting to", uri
+    log.info("Connecting to %s", uri)
 
     ws = MyClient(uri, byterate=16000, mic=args.device, show_hypotheses=args.hypotheses,
-                  save_adaptation_state_filename=args.save_adaptation_state, send_adaptation_state_filename=args.send_adaptation_state, audio_gate=args.audio_gate)
+                  save_adaptation_state_filename=args.save_adaptation_state, send_adaptation_state_filename=args.send_adaptation_state, audio_gate=args.audio_gate,
+                  n_best=args.n_best, latency_log=latency_log, record=record,
+                  redraw=args.log_format == 'text' and args.log_level == 'info' and sys.stderr.isatty())
     ws.connect()
     #result = ws.get_full_hyp()
     #print result.encode('utf-8')
@@ -184,7 +264,7 @@ def main():
     try:
         setup()
     except KeyboardInterrupt:
-        print >> sys.stderr, "\nexiting..."
+        log.info("exiting...")
 
 if __name__ == "__main__":
     main()
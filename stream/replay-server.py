@@ -0,0 +1,87 @@
+# Stand-in for the speech recognition server, to run the clients offline.
+# It replays a session recorded with "mic.py --record" to every client
+# that connects: the same responses (partial and final results,
+# adaptation state, errors) at the same times after the connection was
+# opened. Audio sent by the client is ignored.
+#
+# The recording has one JSON object per line:
+#   {"t": <seconds since the connection opened>, "response": {...}}
+
+import argparse
+import json
+import sys
+import threading
+import time
+from wsgiref.simple_server import make_server
+from ws4py.websocket import WebSocket
+from ws4py.server.wsgirefserver import WSGIServer, WebSocketWSGIRequestHandler
+from ws4py.server.wsgiutils import WebSocketWSGIApplication
+
+def read_session(filename):
+    session = []
+    for line in open(filename):
+        if line.strip() == '': continue
+        record = json.loads(line)
+        session.append((record['t'], json.dumps(record['response'])))
+    session.sort(key=lambda r: r[0])
+    return session
+
+class ReplayWebSocket(WebSocket):
+    session = []
+    speed = 1.0
+
+    def opened(self):
+        self.audio_bytes = 0
+        self.eos = False
+        self.done = threading.Event()
+        thread = threading.Thread(target=self.replay)
+        thread.daemon = True
+        thread.start()
+
+    def replay(self):
+        start = time.time()
+        for t, text in self.session:
+            delay = start + t / self.speed - time.time()
+            if delay > 0:
+                self.done.wait(delay)
+            if self.done.is_set(): return
+            self.send(text)
+        print >> sys.stderr, "Replayed %d responses" % len(self.session)
+        # like the real server, hang up once the client has said it is done
+        while not self.eos and not self.done.is_set():
+            self.done.wait(0.1)
+        if self.eos:
+            print >> sys.stderr, "Received %d bytes of audio and EOS" % self.audio_bytes
+            self.close()
+
+    def received_message(self, m):
+        if m.is_binary:
+            self.audio_bytes += len(m.data)
+        elif str(m) == 'EOS':
+            self.eos = True
+
+    def closed(self, code, reason=None):
+        self.done.set()
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded recognition session to websocket clients')
+    parser.add_argument('-p', '--port', default=8019, type=int, help="Port to listen on (default: 8019)")
+    parser.add_argument('--speed', default=1.0, type=float, help="Replay this many times faster than recorded")
+    parser.add_argument('session', help="Session recorded with mic.py --record")
+    args = parser.parse_args()
+
+    ReplayWebSocket.session = read_session(args.session)
+    ReplayWebSocket.speed = args.speed
+    server = make_server('', args.port, server_class=WSGIServer,
+        handler_class=WebSocketWSGIRequestHandler,
+        app=WebSocketWSGIApplication(handler_cls=ReplayWebSocket))
+    server.initialize_websockets_manager()
+    print >> sys.stderr, "Replaying %d responses on port %d" % (len(ReplayWebSocket.session), args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print >> sys.stderr, "\nexiting..."
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Runs every line of testcases.txt through the scanner, parser and
+# executor in this process, once, and checks the commands of every
+# automator against the expected output of its platform. Also checks
+# which plugins are allowed in which windows. Prints the time each case
+# took; exits with status 1 if any case failed.
+#
+# python run_tests.py [-q]    -q: print only failures
+
+import os, sys, time
+from multiprocessing.pool import ThreadPool
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..', 'grammar'))
+
+from scan import find_keywords, set_keywords, scan
+from parse import SingleInputParser, GrammaticalError, parse
+from execute import ExecuteCommands
+from automators import XDoAutomator, CLIClickAutomator, NirCmdAutomator
+from context import WindowContext, FixedWindowProvider
+from plugins import PluginRouter
+from reload import Grammar
+
+# (name, expected output, automator class, nircmd keymap)
+platforms = [
+    ('linux', 'testcases_expected_linux.txt', XDoAutomator, None),
+    ('mac', 'testcases_expected_mac.txt', CLIClickAutomator, None),
+    ('windows', 'testcases_expected_windows_englishuskeymap.txt',
+        NirCmdAutomator, 'english_us'),
+    ('belgian', 'testcases_expected_windows_belgiankeymap.txt',
+        NirCmdAutomator, 'belgian'),
+]
+
+# (focused window class, utterance, whether it should parse), with the
+# profiles in context.py
+context_cases = [
+    ('xterm', 'shell list', True),
+    ('xterm', 'git status', True),
+    ('emacs', 'git status', True),
+    ('emacs', 'shell list', False),
+    ('firefox', 'shell list', False),
+    ('firefox', 'up', True),
+    ('unknown', 'shell list git status', True),
+    # trigger words in dictation
+    ('unknown', 'phrase use git now', True),
+    ('xterm', 'word shell', True),
+]
+
+def check_contexts(cases):
+    """ the cases whose utterance was (not) accepted in their window
+        when it should (not) have been """
+    router = PluginRouter(Grammar(SingleInputParser()))
+    failures = []
+    for window_class, line, accepted in cases:
+        context = WindowContext(FixedWindowProvider(window_class))
+        parsed = False
+        for active in router.choices(tuple(line.split()), context.triggers()):
+            set_keywords(active.keywords)
+            try:
+                parse(active.parser, scan(line, False))
+                parsed = True
+                break
+            except GrammaticalError:
+                pass
+        if parsed != accepted:
+            failures.append((window_class, line, accepted))
+    return failures
+
+def parse_cases(lines):
+    """ (line, ast, error, seconds) for every line. The parser is not
+        thread-safe, so this happens before anything runs in parallel. """
+    parser = SingleInputParser()
+    find_keywords(parser)
+    cases = []
+    for line in lines:
+        start = time.time()
+        try:
+            ast, error = parse(parser, scan(line, False)), None
+        except GrammaticalError as e:
+            ast, error = None, e
+        cases.append((line, ast, error, time.time() - start))
+    return cases
+
+def run_platform(cases, automator_class, keymap):
+    """ (output lines, seconds) for every case, in the format main.py
+        prints them """
+    outputs = []
+    for line, ast, error, _ in cases:
+        start = time.time()
+        if error is not None:
+            lines = ['Error: %s' % error]
+        else:
+            automator = automator_class(False)
+            if keymap is not None:
+                automator.keymap = keymap
+            ExecuteCommands(ast, automator=automator)
+            lines = ['`%s`' % command for command in automator.executed]
+        outputs.append((lines, time.time() - start))
+    return outputs
+
+def compare(outputs, expected):
+    """ for every case, None or the (output, expected) lines that differ;
+        and the expected lines that no case produced """
+    failures = []
+    i = 0
+    for lines, _ in outputs:
+        wanted = expected[i:i + len(lines)]
+        i += len(lines)
+        if lines == wanted:
+            failures.append(None)
+        else:
+            failures.append((lines, wanted))
+    return failures, expected[i:]
+
+def read_expected(filename):
+    lines = open(os.path.join(here, filename)).read().splitlines()
+    return [line.rstrip('\r') for line in lines if line.strip()]
+
+if __name__ == '__main__':
+    quiet = '-q' in sys.argv[1:]
+    lines = [line.strip() for line in open(os.path.join(here, 'testcases.txt'))
+        if line.strip()]
+
+    start = time.time()
+    cases = parse_cases(lines)
+    pool = ThreadPool(len(platforms))
+    outputs = pool.map(lambda p: run_platform(cases, p[2], p[3]), platforms)
+    results = [compare(o, read_expected(p[1]))
+        for p, o in zip(platforms, outputs)]
+    context_failures = check_contexts(context_cases)
+    elapsed = time.time() - start
+
+    if not quiet:
+        print '%-40s %9s' % ('case', 'parse us') + \
+            ''.join([' %9s' % p[0] for p in platforms])
+    for i, (line, ast, error, parse_time) in enumerate(cases):
+        if quiet: break
+        row = '%-40s %9.1f' % (line[:40], parse_time * 1e6)
+        for (failures, extra), o in zip(results, outputs):
+            if failures[i] is None:
+                row += ' %9.1f' % (o[i][1] * 1e6)
+            else:
+                row += ' %9s' % 'FAIL'
+        print row
+
+    failed = 0
+    for p, (failures, extra) in zip(platforms, results):
+        for line, failure in zip(lines, failures):
+            if failure is None: continue
+            failed += 1
+            print '%s: %s' % (p[0], line)
+            for got in failure[0]: print '    got      %s' % got
+            for wanted in failure[1]: print '    expected %s' % wanted
+        if extra:
+            failed += 1
+            print '%s: %d expected lines were not produced' % (p[0], len(extra))
+            for wanted in extra: print '    expected %s' % wanted
+
+    for window_class, line, accepted in context_failures:
+        failed += 1
+        print 'context: %s in a %s window should %sparse' % (line,
+            window_class, not accepted and 'not ' or '')
+
+    if failed or not quiet:
+        print '%d cases on %d platforms in %.1f ms: %s' % (len(cases),
+            len(platforms), elapsed * 1e3,
+            failed and '%d failed' % failed or 'ok')
+    sys.exit(failed and 1 or 0)
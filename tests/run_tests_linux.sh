@@ -3,3 +3,7 @@ python ../grammar/main.py testcases.txt > test_out.txt
 grep -e "xdotool" -e "Error:" test_out.txt > commands.txt
 diff commands.txt testcases_expected_linux.txt
 rm test_out.txt commands.txt
+python run_tests.py -q
+python ../grammar/export.py --check ../grammar/example.xml
+python ../grammar/fastpath.py --check testcases.txt
+python ../grammar/lm.py --check 4
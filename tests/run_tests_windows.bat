@@ -7,3 +7,11 @@ python ../grammar/main.py testcases.txt > test_out.txt
 grep -e "nircmd" -e "Error:" test_out.txt > commands.txt
 diff --strip-trailing-cr commands.txt testcases_expected_windows_englishuskeymap.txt
 rm test_out.txt commands.txt
+python ../grammar/main.py --keymap belgian testcases.txt > test_out.txt
+grep -e "nircmd" -e "Error:" test_out.txt > commands.txt
+diff --strip-trailing-cr commands.txt testcases_expected_windows_belgiankeymap.txt
+rm test_out.txt commands.txt
+python run_tests.py -q
+python ../grammar/export.py --check ../grammar/example.xml
+python ../grammar/fastpath.py --check testcases.txt
+python ../grammar/lm.py --check 4